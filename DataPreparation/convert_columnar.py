@@ -0,0 +1,37 @@
+'''
+convert dataset created by preprocess_tokens.py into columnar format.
+
+This script allows the user to convert existing pickle or json dataset
+into a directory of columnar format, which IDGDatasetBase opens with mmap.
+'''
+
+import argparse
+import json
+from pathlib import Path
+
+from preprocess_tokens import load_pickle, save_columnar
+
+
+def load_dataset(path):
+    '''load pickle or json dataset.'''
+    in_path = Path(path)
+    if in_path.suffix == '.json':
+        with in_path.open('r') as f:
+            return json.load(f)
+    return load_pickle(in_path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('DATASET', type=str,
+                        help='path to dataset created by preprocess_tokens.py')
+    parser.add_argument('VOCAB', type=str,
+                        help='path to vocabulary dictionary used to encode DATASET')
+    parser.add_argument('OUT', type=str,
+                        help='path to directory to save columnar dataset')
+    args = parser.parse_args()
+
+    DATASET = load_dataset(args.DATASET)
+    WORD_IDS = load_dataset(args.VOCAB)
+
+    save_columnar(DATASET['captions'], DATASET['images'], WORD_IDS, args.OUT)
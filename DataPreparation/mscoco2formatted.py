@@ -8,8 +8,10 @@ which is easier to preprocess for image captioning task.
 import json
 import pickle
 import argparse
+from array import array
 from pathlib import Path
 
+import numpy as np
 from tqdm import tqdm
 
 
@@ -67,6 +69,20 @@ def make_groups(annots):
 
     return itoa
 
+def image_file_path(file_name):
+    '''
+    return file path of an image relative to image root.
+
+    file_name of MSCOCO is like 'COCO_train2014_000000003232.jpg',
+    and the image is in the directory of its split, e.g. 'train2014/COCO_train2014_...'.
+    file_name without 'COCO_<split>_' prefix(e.g. STAIR or other datasets)
+    is returned as it is.
+    '''
+    parts = file_name.split('_')
+    if len(parts) < 3 or parts[0] != 'COCO':
+        return file_name
+    return str(Path(parts[1], file_name))
+
 def make_formatted(itoa, imgs):
     EXIST_TOKEN = False
     out_data = []
@@ -75,12 +91,9 @@ def make_formatted(itoa, imgs):
         img_id = img['id']
 
         # img['file_name'] format is usually like 'COCO_train2014_0003232.jpg'
-        # data_origin is where dataset comes from.
-        # So train2014 should be set to data_origin by img['file_name'].split('_')[1]
-        data_origin = img['file_name'].split('_')[1]
-
+        # train2014 is where dataset comes from and the directory of the image.
         pairs = {}
-        pairs['file_path'] = str(Path(data_origin, img['file_name']))
+        pairs['file_path'] = image_file_path(img['file_name'])
         pairs['id'] = img_id
 
         sentences = []
@@ -104,21 +117,211 @@ def make_formatted(itoa, imgs):
     return out_data
 
 
+class JSONStream:
+    '''
+    incremental reader of a large JSON file.
+
+    The file is read in chunks and each value is decoded by json.JSONDecoder.raw_decode,
+    so only the current chunk and the current value are kept in memory.
+    '''
+
+    def __init__(self, f, chunk_size=1 << 20):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _read(self):
+        '''read next chunk and drop consumed characters.'''
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+
+    def peek(self):
+        '''return next non-whitespace character without consuming it.'''
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if self.eof:
+                raise ValueError('unexpected end of JSON file\n')
+            self._read()
+
+    def expect(self, char):
+        '''consume char.'''
+        if self.peek() != char:
+            msg = 'expected %s but found %s in JSON file\n' % (char, self.peek())
+            raise ValueError(msg)
+        self.pos += 1
+
+    def decode(self):
+        '''decode and consume next value.'''
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # a number at the end of chunk may continue in the next chunk.
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._read()
+
+    def items(self, keys):
+        '''
+        iterate over elements of arrays of keys in top level object.
+        values of the other keys are decoded and discarded.
+
+        Yields
+        ------
+        key: str
+            key of top level object.
+        value: object
+            each element of the array.
+        '''
+        self.expect('{')
+        while self.peek() != '}':
+            key = self.decode()
+            self.expect(':')
+            if key in keys:
+                self.expect('[')
+                while self.peek() != ']':
+                    yield key, self.decode()
+                    if self.peek() == ',':
+                        self.pos += 1
+                self.expect(']')
+            else:
+                self.decode()
+            if self.peek() == ',':
+                self.pos += 1
+
+
+class TextArray:
+    '''list of strings packed into one UTF-8 buffer and offsets.'''
+
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = array('q', [0])
+
+    def append(self, text):
+        self.data += text.encode('utf-8')
+        self.offsets.append(len(self.data))
+
+    def __getitem__(self, i):
+        return self.data[self.offsets[i]:self.offsets[i + 1]].decode('utf-8')
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+
+def stream_formatted(mscoco_path, chunk_size=1 << 20):
+    '''
+    convert MSCOCO caption dataset into formatted records in bounded memory.
+
+    images and annotations are parsed incrementally, and annotations are grouped
+    by image_id with compact arrays instead of a dict of lists of dicts.
+    Memory is about the size of caption text plus 16 bytes for each annotation.
+
+    Parameters
+    ----------
+    mscoco_path: str
+        The file location of the mscoco caption dataset.
+        The file has to be json format.
+    chunk_size: int
+        number of characters read at once.
+
+    Yields
+    ------
+    pairs: dict
+        formatted record of each image which contains 'file_path', 'id', 'captions'
+        and 'tokenized_captions' if annotations have 'tokenized_caption'.
+        records are in the same order as make_formatted.
+    '''
+    img_ids = array('q')
+    file_names = TextArray()
+    annot_img_ids = array('q')
+    captions = TextArray()
+    tokenized = None
+
+    with open(str(mscoco_path)) as f:
+        stream = JSONStream(f, chunk_size=chunk_size)
+        for key, value in tqdm(stream.items(('images', 'annotations'))):
+            if key == 'images':
+                img_ids.append(value['id'])
+                file_names.append(value['file_name'])
+            else:
+                annot_img_ids.append(value['image_id'])
+                captions.append(value['caption'])
+                if len(captions) == 1 and 'tokenized_caption' in value:
+                    tokenized = TextArray()
+                if tokenized is not None:
+                    tokenized.append(value.get('tokenized_caption', ''))
+
+    # stable sort keeps the order of annotations of each image.
+    annot_img_ids = np.array(annot_img_ids, dtype=np.int64)
+    order = np.argsort(annot_img_ids, kind='mergesort')
+    sorted_ids = annot_img_ids[order]
+
+    for i in range(len(img_ids)):
+        img_id = img_ids[i]
+        file_name = file_names[i]
+        start, end = np.searchsorted(sorted_ids, [img_id, img_id + 1])
+        rows = order[start:end]
+
+        pairs = {}
+        pairs['file_path'] = image_file_path(file_name)
+        pairs['id'] = img_id
+        pairs['captions'] = [captions[row] for row in rows]
+        if tokenized is not None:
+            pairs['tokenized_captions'] = [tokenized[row] for row in rows]
+
+        yield pairs
+
+
+def save_jsonl(records, out_path):
+    '''save formatted records one by one as JSON lines.'''
+    with open(str(out_path), 'w') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False))
+            f.write('\n')
+
+
+def load_jsonl(in_path):
+    '''iterate over formatted records saved by save_jsonl.'''
+    with open(str(in_path)) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description=__doc__)
     parser.add_argument('MSCOCO_DATASET', type=str,
                         help='path to MSCOCO caption dataset.')
     parser.add_argument('OUT', type=str,
                         help='path to output\(File format has to be json or pickle\)')
+    parser.add_argument('--stream', action='store_true', default=False,
+                        help='parse dataset incrementally and save OUT as JSON lines \
+                        in bounded memory')
     args = parser.parse_args()
 
     in_path = Path(args.MSCOCO_DATASET)
     out_path = Path(args.OUT)
 
-    if in_path.exists():
-        annots, imgs = read_mscoco(in_path)
-        itoa = make_groups(annots)
-        out_data = make_formatted(itoa, imgs)
+    if args.stream:
+        save_jsonl(stream_formatted(in_path), out_path)
+    else:
+        if in_path.exists():
+            annots, imgs = read_mscoco(in_path)
+            itoa = make_groups(annots)
+            out_data = make_formatted(itoa, imgs)
 
-    with open(out_path, 'wb') as f:
-        pickle.dump(out_data, f, pickle.HIGHEST_PROTOCOL)
+        with open(out_path, 'wb') as f:
+            pickle.dump(out_data, f, pickle.HIGHEST_PROTOCOL)
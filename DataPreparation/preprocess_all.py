@@ -0,0 +1,163 @@
+'''
+preprocess all splits of caption corpora in one run.
+
+This script runs mscoco2formatted.py and preprocess_tokens.py for every split
+listed in a JSON config without writing intermediate pickles.
+A tokenizer is created once for each corpus, vocabulary is built on the train split,
+and the other splits are encoded with it.
+Independent corpora (e.g. MSCOCO and STAIR) are processed concurrently in separate processes.
+
+Config
+------
+{
+  "corpora": [
+    {
+      "name": "MSCOCO",
+      "tokenizer": {"lang": "en", "tokenize": true, "to_lower": true,
+                    "remove_suffix": true, "replace_digits": true},
+      "cutoff": 5,
+      "vocab_size": 0,
+      "vocab_path": "data/vocab/mscoco_train2014_vocab.pkl",
+      "workers": 1,
+      "token_cache": "data/captions/token_cache.sqlite",
+      "columnar": false,
+      "splits": [
+        {"input": "data/captions/original/MSCOCO_captions_en/captions_train2014.json",
+         "output": "data/captions/converted/MSCOCO_captions/train2014.pkl",
+         "build_vocab": true},
+        {"input": "data/captions/original/MSCOCO_captions_en/captions_val2014.json",
+         "output": "data/captions/converted/MSCOCO_captions/val2014.pkl"}
+      ]
+    }
+  ]
+}
+
+vocabulary is saved to vocab_path if a split has build_vocab,
+otherwise it is loaded from vocab_path to encode all splits.
+'''
+
+import argparse
+import json
+import multiprocessing
+import time
+from pathlib import Path
+
+from mscoco2formatted import stream_formatted
+from preprocess_tokens import (
+    TokenCache,
+    Tokenizer,
+    create_captions,
+    create_word_dict,
+    load_pickle,
+    save_dataset,
+    save_pickle,
+)
+
+
+def format_split(path):
+    '''read MSCOCO format caption dataset incrementally and return formatted data.'''
+    return list(stream_formatted(path))
+
+
+def process_corpus(corpus):
+    '''
+    format, tokenize and encode all splits of a corpus.
+
+    Parameters
+    ----------
+    corpus: dict
+        config of a corpus. see the docstring of this module.
+    '''
+    name = corpus.get('name', '')
+    start = time.perf_counter()
+
+    tokenizer = Tokenizer(**corpus.get('tokenizer', {}))
+    token_cache = None
+    if corpus.get('token_cache'):
+        Path(corpus['token_cache']).parent.mkdir(parents=True, exist_ok=True)
+        token_cache = TokenCache(corpus['token_cache'], tokenizer.get_config())
+
+    # build vocabulary first, then encode the other splits with it.
+    splits = sorted(corpus['splits'], key=lambda split: not split.get('build_vocab', False))
+    if sum(split.get('build_vocab', False) for split in splits) > 1:
+        msg = 'only one split can build vocabulary in corpus %s\n' % name
+        raise ValueError(msg)
+
+    word_ids = None
+    if not splits[0].get('build_vocab', False):
+        word_ids = load_pickle(corpus['vocab_path'])
+
+    for split in splits:
+        print('{0}: processing {1}'.format(name, split['input']))
+        captions, images, word_counter = create_captions(
+            format_split(split['input']),
+            tokenizer,
+            workers=corpus.get('workers', 1),
+            cache=token_cache
+        )
+
+        if split.get('build_vocab', False):
+            word_ids = create_word_dict(
+                word_counter, corpus.get('cutoff', 5), corpus.get('vocab_size', 0)
+            )
+            Path(corpus['vocab_path']).parent.mkdir(parents=True, exist_ok=True)
+            save_pickle(word_ids, corpus['vocab_path'])
+
+        save_dataset(
+            captions, images, word_ids, split['output'], columnar=corpus.get('columnar', False)
+        )
+
+    if token_cache is not None:
+        print('{0}: token cache hit rate: {1:.1%}'.format(name, token_cache.hit_rate()))
+        token_cache.close()
+
+    print('{0}: done in {1:.1f} sec'.format(name, time.perf_counter() - start))
+
+
+def process_all(config, concurrent=True):
+    '''
+    process all corpora in config.
+
+    Parameters
+    ----------
+    config: dict
+        config which contains a list of 'corpora'.
+    concurrent: bool
+        process each corpus in a separate process at the same time.
+        each process can also use its own pool of tokenizer workers.
+    '''
+    corpora = config['corpora']
+    if not concurrent or len(corpora) == 1:
+        for corpus in corpora:
+            process_corpus(corpus)
+        return
+
+    # processes are not daemonic, so each of them can create a pool of tokenizer workers.
+    processes = [
+        multiprocessing.Process(target=process_corpus, args=(corpus,), name=corpus.get('name'))
+        for corpus in corpora
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    failed = [process.name for process in processes if process.exitcode != 0]
+    if failed:
+        msg = 'preprocessing of %s failed\n' % ', '.join(str(name) for name in failed)
+        raise RuntimeError(msg)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('CONFIG', type=str,
+                        help='path to JSON config which lists corpora and splits')
+    parser.add_argument('--sequential', action='store_true', default=False,
+                        help='process corpora one by one instead of concurrently')
+    args = parser.parse_args()
+
+    with open(args.CONFIG) as f:
+        CONFIG = json.load(f)
+
+    process_all(CONFIG, concurrent=not args.sequential)
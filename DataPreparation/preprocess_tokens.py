@@ -7,12 +7,20 @@ mainly it tokenize sentences, lower characters, remove suffix and replace all di
 
 import argparse
 import collections
+import hashlib
+import json
+import multiprocessing
 import pickle
 import re
-from itertools import dropwhile
+import sqlite3
+from itertools import chain, dropwhile
 from pathlib import Path
+
+import numpy as np
 from tqdm import tqdm
 
+from mscoco2formatted import load_jsonl
+
 
 class Tokenizer(object):
     """
@@ -122,6 +130,12 @@ class Tokenizer(object):
             tokenized sentences with some processing.
             if not, then return splitted sentences.
         """
+        sen = self.normalize(sen)
+
+        return self.segmenter(sen) if self.tokenize else sen.split()
+
+    def normalize(self, sen):
+        """lower characters, remove suffix and replace digits before tokenization."""
         if self.to_lower:
             sen = sen.strip().lower()
 
@@ -131,7 +145,180 @@ class Tokenizer(object):
         if self.replace_digits:
             sen = self.split_digits.sub('0', sen)
 
-        return self.segmenter(sen) if self.tokenize else sen.split()
+        return sen
+
+    def get_config(self):
+        """return parameters to create the same tokenizer in other processes."""
+        return {
+            'lang': self.lang,
+            'tokenize': self.tokenize,
+            'to_lower': self.to_lower,
+            'remove_suffix': self.remove_suffix,
+            'replace_digits': self.replace_digits,
+        }
+
+
+class TokenCache(object):
+    """
+    persistent cache of tokens saved in SQLite.
+
+    tokens are keyed by tokenizer config and hash of normalized sentence,
+    so sentences which are the same after normalization share tokens,
+    and tokens of a different tokenizer config are never returned.
+
+    Attributes
+    ----------
+    path: str
+        path to SQLite database.
+    config_key: str
+        hash of tokenizer config.
+    hits: int
+        number of sentences found in cache.
+    misses: int
+        number of sentences tokenized and added to cache.
+    """
+
+    # SQLite limits number of variables in a query.
+    batch_size = 500
+
+    def __init__(self, path, config):
+        """
+        Parameters
+        ----------
+        path: str
+            path to SQLite database. it is created if it does not exist.
+        config: dict
+            tokenizer config returned by Tokenizer.get_config().
+        """
+        self.path = str(path)
+        self.config_key = hashlib.sha1(
+            json.dumps(config, sort_keys=True).encode('utf-8')
+        ).hexdigest()
+        self.hits = 0
+        self.misses = 0
+
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS tokens ('
+            'config TEXT, hash BLOB, tokens TEXT, PRIMARY KEY (config, hash)'
+            ') WITHOUT ROWID'
+        )
+
+    @staticmethod
+    def sentence_hash(normalized):
+        """return hash of normalized sentence."""
+        return hashlib.sha1(normalized.encode('utf-8')).digest()
+
+    def get_many(self, hashes):
+        """return dict which maps each hash found in cache to its tokens."""
+        found = {}
+        hashes = list(hashes)
+        for i in range(0, len(hashes), self.batch_size):
+            batch = hashes[i:i + self.batch_size]
+            rows = self.conn.execute(
+                'SELECT hash, tokens FROM tokens WHERE config = ? AND hash IN ({0})'.format(
+                    ','.join('?' * len(batch))
+                ),
+                [self.config_key] + batch
+            )
+            for key, tokens in rows:
+                found[key] = json.loads(tokens)
+
+        return found
+
+    def put_many(self, items):
+        """add pairs of hash and tokens to cache."""
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO tokens VALUES (?, ?, ?)',
+                ((self.config_key, key, json.dumps(tokens, ensure_ascii=False))
+                 for key, tokens in items)
+            )
+
+    def hit_rate(self):
+        """ratio of sentences found in cache."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def close(self):
+        self.conn.close()
+
+
+# tokenizer created once in each worker process of tokenize_sentences.
+_WORKER_TOKENIZER = None
+
+
+def _init_worker(config):
+    global _WORKER_TOKENIZER
+    _WORKER_TOKENIZER = Tokenizer(**config)
+
+
+def _tokenize_chunk(sentences):
+    return [_WORKER_TOKENIZER.pre_process(sen) for sen in sentences]
+
+
+def tokenize_sentences(sentences, tokenizer, workers=1, chunk_size=1000, cache=None):
+    """
+    tokenize sentences serially or in chunks across a process pool.
+    if cache is set, only sentences missing in cache are tokenized.
+
+    Parameters
+    ----------
+    sentences: list
+        list of sentences.
+    tokenizer: Tokenizer
+        tokenizer to preprocess sentences.
+        each worker process creates its own tokenizer with tokenizer.get_config().
+    workers: int
+        number of worker processes. sentences are tokenized serially if it is 1.
+    chunk_size: int
+        number of sentences sent to a worker process at once.
+    cache: TokenCache
+        persistent cache of tokens. tokens of missing sentences are added to it.
+
+    Returns
+    -------
+    list of tokens of each sentence in the same order as sentences.
+    """
+    if cache is not None:
+        return _tokenize_with_cache(sentences, tokenizer, workers, chunk_size, cache)
+
+    if workers <= 1 or len(sentences) <= chunk_size:
+        return [tokenizer.pre_process(sen) for sen in tqdm(sentences)]
+
+    chunks = [sentences[i:i + chunk_size] for i in range(0, len(sentences), chunk_size)]
+    with multiprocessing.Pool(
+            workers, initializer=_init_worker, initargs=(tokenizer.get_config(),)
+    ) as pool:
+        # imap keeps the order of chunks, so the result is the same as the serial one.
+        tokenized = list(tqdm(pool.imap(_tokenize_chunk, chunks), total=len(chunks)))
+
+    return list(chain.from_iterable(tokenized))
+
+
+def _tokenize_with_cache(sentences, tokenizer, workers, chunk_size, cache):
+    hashes = [cache.sentence_hash(tokenizer.normalize(sen)) for sen in sentences]
+    found = cache.get_many(set(hashes))
+
+    # tokenize each missing sentence only once.
+    missing = {}
+    for key, sen in zip(hashes, sentences):
+        if key not in found and key not in missing:
+            missing[key] = sen
+
+    num_hits = sum(key in found for key in hashes)
+    cache.hits += num_hits
+    cache.misses += len(hashes) - num_hits
+
+    if missing:
+        tokenized = tokenize_sentences(
+            list(missing.values()), tokenizer, workers=workers, chunk_size=chunk_size
+        )
+        new_tokens = dict(zip(missing, tokenized))
+        cache.put_many(new_tokens.items())
+        found.update(new_tokens)
+
+    return [found[key] for key in hashes]
 
 
 def token2index(tokens, word_ids):
@@ -153,6 +340,46 @@ def token2index(tokens, word_ids):
             else word_ids['<UNK>'] for token in tokens]
 
 
+def encode_tokens(captions, word_ids):
+    """
+    encode tokens of all captions into one packed array for columnar format.
+
+    each distinct token is looked up in word_ids only once,
+    and all tokens are mapped to ids at once by indexing ids of distinct tokens
+    with the inverse index of each token.
+
+    Parameters
+    ----------
+    captions: list
+        captions which contain list of tokens as 'caption'.
+    word_ids: dict
+        map to ids from tokens. it has to contain '<UNK>'.
+
+    Returns
+    -------
+    tokens: numpy.ndarray
+        int32 word ids of all captions concatenated.
+    offsets: numpy.ndarray
+        int64 array of shape (len(captions) + 1,).
+        word ids of captions[i] are tokens[offsets[i]:offsets[i + 1]].
+    """
+    offsets = np.zeros(len(captions) + 1, dtype=np.int64)
+    np.cumsum([len(caption['caption']) for caption in captions], out=offsets[1:])
+
+    flat = list(chain.from_iterable(caption['caption'] for caption in captions))
+    unique = list(dict.fromkeys(flat))
+    inverse = np.fromiter(
+        map(dict(zip(unique, range(len(unique)))).__getitem__, flat),
+        dtype=np.int64,
+        count=len(flat)
+    )
+
+    unk_id = word_ids['<UNK>']
+    ids = np.array([word_ids.get(token, unk_id) for token in unique], dtype=np.int32)
+
+    return ids[inverse], offsets
+
+
 def encode_captions(captions, word_index):
     '''encode captions into digits based on word_index'''
     for caption in tqdm(captions):
@@ -169,6 +396,16 @@ def load_pickle(in_file):
     return row_data
 
 
+def load_formatted(in_file):
+    """
+    load formatted data created by mscoco2formatted.py.
+    it is a pickle, or JSON lines if it is created with --stream.
+    """
+    if Path(in_file).suffix == '.jsonl':
+        return list(load_jsonl(in_file))
+    return load_pickle(in_file)
+
+
 def save_pickle(in_file, out_file):
     """save pickle file."""
     out_path = Path(out_file)
@@ -176,7 +413,89 @@ def save_pickle(in_file, out_file):
         pickle.dump(in_file, f, pickle.HIGHEST_PROTOCOL)
 
 
-def create_captions(formatted_data, tokenizer):
+def save_columnar(captions, images, word_ids, out_dir):
+    """
+    save dataset in columnar format which IDGDatasetBase opens with mmap.
+    see utils/columnar.py for the layout.
+
+    Parameters
+    ----------
+    captions: list
+        encoded captions which contain 'img_idx', 'caption', 'caption_idx'.
+    images: list
+        images which contain 'file_path' and 'img_idx'.
+    word_ids: dict
+        map to ids from tokens.
+    out_dir: str
+        path to directory to save dataset.
+    """
+    captions = sorted(captions, key=lambda caption: caption['caption_idx'])
+
+    offsets = np.zeros(len(captions) + 1, dtype=np.int64)
+    np.cumsum([len(caption['caption']) for caption in captions], out=offsets[1:])
+    tokens = np.fromiter(
+        chain.from_iterable(caption['caption'] for caption in captions),
+        dtype=np.int32,
+        count=offsets[-1]
+    )
+    cap2img = np.array([caption['img_idx'] for caption in captions], dtype=np.int32)
+
+    save_packed(tokens, offsets, cap2img, images, word_ids, out_dir)
+
+
+def save_packed(tokens, offsets, cap2img, images, word_ids, out_dir):
+    """
+    save packed word ids of captions in columnar format.
+
+    Parameters
+    ----------
+    tokens: numpy.ndarray
+        int32 word ids of all captions concatenated in order of caption_idx.
+    offsets: numpy.ndarray
+        int64 offsets of each caption in tokens.
+    cap2img: numpy.ndarray
+        int32 img_idx of each caption.
+    images: list
+        images which contain 'file_path' and 'img_idx'.
+    word_ids: dict
+        map to ids from tokens.
+    out_dir: str
+        path to directory to save dataset.
+    """
+    out_path = Path(out_dir)
+    out_path.mkdir(parents=True, exist_ok=True)
+
+    images = sorted(images, key=lambda image: image['img_idx'])
+    file_paths = np.array([image['file_path'] for image in images], dtype=np.str_)
+    vocab = np.array(sorted(word_ids, key=word_ids.get), dtype=np.str_)
+
+    np.save(str(out_path / 'tokens.npy'), tokens)
+    np.save(str(out_path / 'offsets.npy'), offsets)
+    np.save(str(out_path / 'cap2img.npy'), cap2img)
+    np.save(str(out_path / 'file_paths.npy'), file_paths)
+    np.save(str(out_path / 'vocab.npy'), vocab)
+
+
+def save_dataset(captions, images, word_ids, out_path, columnar=False):
+    """
+    encode tokenized captions and save them with images
+    as a pickle or a directory of columnar format.
+    columnar format is written from packed word ids without creating lists of ids.
+    parent directories are created if they do not exist.
+    """
+    out_path = Path(out_path)
+    if columnar:
+        captions = sorted(captions, key=lambda caption: caption['caption_idx'])
+        tokens, offsets = encode_tokens(captions, word_ids)
+        cap2img = np.array([caption['img_idx'] for caption in captions], dtype=np.int32)
+        save_packed(tokens, offsets, cap2img, images, word_ids, out_path)
+    else:
+        captions = encode_captions(captions, word_ids)
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        save_pickle({'images': images, 'captions': captions}, out_path)
+
+
+def create_captions(formatted_data, tokenizer, workers=1, chunk_size=1000, cache=None):
     """
     separate image and captions from formatted data.
     and preprocess captions.
@@ -187,6 +506,13 @@ def create_captions(formatted_data, tokenizer):
         formated data preprocessed by mscoco2formatted.py
     tokenizer: class
         tokenizer to preprocess captions
+    workers: int
+        number of processes to tokenize captions.
+        output is the same regardless of workers.
+    chunk_size: int
+        number of captions sent to a worker process at once.
+    cache: TokenCache
+        persistent cache of tokens. cached captions are not tokenized again.
 
     Returns
     -------
@@ -205,13 +531,22 @@ def create_captions(formatted_data, tokenizer):
 
     word_counter = collections.Counter()
 
+    def caption_type(img):
+        return 'tokenized_captions' if 'tokenized_captions' in img else 'captions'
+
+    tokenized = iter(tokenize_sentences(
+        [caption for img in formatted_data for caption in img[caption_type(img)]],
+        tokenizer,
+        workers=workers,
+        chunk_size=chunk_size,
+        cache=cache
+    ))
+
     # append each captions and images separately into captions and images.
     for img in tqdm(formatted_data):
-        caption_type = 'tokenized_captions' if 'tokenized_captions' in img else 'captions'
-
-        for caption in img[caption_type]:
+        for _ in img[caption_type(img)]:
             caption_tokens = ['<SOS>']
-            caption_tokens += tokenizer.pre_process(caption)
+            caption_tokens += next(tokenized)
             caption_tokens.append('<EOS>')
             captions.append(
                 {'img_idx': img_idx,
@@ -283,7 +618,8 @@ if __name__ == '__main__':
 
     parser = argparse.ArgumentParser(description=__doc__)
     parser.add_argument('INPUT', type=str,
-                        help="input formatted file by mscoco2formatted.py")
+                        help="input formatted file by mscoco2formatted.py. \
+                        .jsonl file created with --stream is also accepted.")
     parser.add_argument('OUT_DATASET', type=str,
                         help="output file name")
     parser.add_argument('--in_vocab_path', type=str, default='',
@@ -305,6 +641,12 @@ if __name__ == '__main__':
                         help="cutoff words less than the number digignated")
     parser.add_argument('--vocab_size', type=int, default=0,
                         help='vocabrary size')
+    parser.add_argument('--columnar', action='store_true', default=False,
+                        help='save OUT_DATASET as a directory of columnar format')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='number of processes to tokenize captions')
+    parser.add_argument('--token_cache', type=str, default='',
+                        help='path to SQLite database to cache tokens of each sentence')
     args = parser.parse_args()
 
     # read files
@@ -318,19 +660,25 @@ if __name__ == '__main__':
         remove_suffix=args.remove_suffix
     )
 
-    FORMATTED_MSCOCO = load_pickle(IN_PATH)
-    CAPTIONS, IMGS, WORD_COUNTER = create_captions(FORMATTED_MSCOCO, TOKENIZER)
+    TOKEN_CACHE = TokenCache(args.token_cache, TOKENIZER.get_config()) if args.token_cache else None
+
+    FORMATTED_MSCOCO = load_formatted(IN_PATH)
+    CAPTIONS, IMGS, WORD_COUNTER = create_captions(
+        FORMATTED_MSCOCO, TOKENIZER, workers=args.workers, cache=TOKEN_CACHE
+    )
+
+    if TOKEN_CACHE is not None:
+        print('token cache hit rate: {0:.1%} ({1} / {2})'.format(
+            TOKEN_CACHE.hit_rate(), TOKEN_CACHE.hits, TOKEN_CACHE.hits + TOKEN_CACHE.misses
+        ))
+        TOKEN_CACHE.close()
 
     if args.in_vocab_path:
         WORD_INDEX = load_pickle(args.in_vocab_path)
     else:
         WORD_INDEX = create_word_dict(WORD_COUNTER, args.cutoff, args.vocab_size)
 
-    CAPTIONS = encode_captions(CAPTIONS, WORD_INDEX)
-
-    OUT_DATASET = {'images': IMGS, 'captions': CAPTIONS}
-
-    save_pickle(OUT_DATASET, args.OUT_DATASET)
+    save_dataset(CAPTIONS, IMGS, WORD_INDEX, args.OUT_DATASET, columnar=args.columnar)
 
     if args.out_vocab_path:
         save_pickle(WORD_INDEX, args.out_vocab_path)
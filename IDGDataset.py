@@ -2,12 +2,21 @@ import json
 import pickle
 from pathlib import Path
 
-from tqdm import tqdm
 import cv2
 import numpy as np
 import chainer
 
+from utils.cache import LRUCache
+from utils.caption_store import PackedCaptions
+from utils.columnar import is_columnar, load_columnar
+from utils.feature_store import FeatureStore, feature_path, load_feature, read_features
 from utils.process_image import ImgProcesser
+from utils.profiler import NULL_PROFILER
+from utils.sharding import shard_indices
+from utils.statistics import (
+    CorpusStatistics, compute_statistics, source_signature, stats_path, unk_ratio
+)
+from utils.shared_memory import DEFAULT_SHM_DIR, SharedArray, create_shared_path
 
 
 class IDGDatasetBase(chainer.dataset.DatasetMixin):
@@ -18,18 +27,21 @@ class IDGDatasetBase(chainer.dataset.DatasetMixin):
     ----------
     word_ids : dict
         map to ids from tokens.
+        it is created when it is used first if dataset is columnar format.
 
-    inv_word_ids : dict
+    inv_word_ids : dict or numpy.ndarray
         map to tokens from ids.
+        it is numpy.ndarray of tokens ordered by ids if dataset is columnar format.
 
-    captions: list
-        list of captions loaded from dataset.
+    captions: PackedCaptions
+        captions loaded from dataset packed into flat int32 arrays.
 
-    images: list
+    images: list or ImageTable
         list of images loadef from dataset.
 
-    cap2img: dict
+    cap2img: numpy.ndarray
         relatinships betweein caption id and image id.
+        cap2img[caption_idx] is img_idx of the caption.
 
     img_root : str
         path to directory of images.
@@ -59,7 +71,51 @@ class IDGDatasetBase(chainer.dataset.DatasetMixin):
 
     img_features : numpy.ndarray
         numpy.ndarray to save all image features onto RAM.
+        It is numpy.memmap if preload_cache or share_features is set.
         This attribute is available only when preload_features is True.
+
+    feature_store : FeatureStore
+        memory mapped feature store created by utils/feature_store.py.
+        This attribute is available only when feature_store is set.
+
+    img_cache : FeatureStore
+        memory mapped uint8 images created by utils/image_cache.py.
+        This attribute is available only when raw_img is True and img_cache is set.
+
+    shared_features : SharedArray
+        handle of file which backs self.img_features.
+        This attribute is available only when preload_cache or share_features is set.
+
+    cache : LRUCache
+        LRU cache of images or image features loaded on demand.
+        This attribute is None when cache_bytes is 0.
+
+    profiler : StageProfiler
+        profiler to measure time of each stage of loading.
+        NULL_PROFILER which measures nothing is used as a default.
+
+    rank : int
+        rank of this process in data-parallel training.
+
+    world_size : int
+        number of ranks in data-parallel training.
+
+    shard_images : numpy.ndarray
+        img_idx of images owned by this rank.
+        This attribute is None when world_size is 1.
+
+    caption_indices : numpy.ndarray
+        original caption indices of captions owned by this rank.
+        caption i of this dataset is caption caption_indices[i] of the whole dataset.
+        some captions are repeated at the end to pad shards to the same length.
+        This attribute is None when world_size is 1.
+
+    img_rows : numpy.ndarray
+        row in img_features for each img_idx. -1 if the image is not owned.
+        This attribute is None when world_size is 1.
+
+    stats : CorpusStatistics
+        memoized statistics of captions saved next to the dataset.
     """
     def __init__(
             self,
@@ -72,6 +128,20 @@ class IDGDatasetBase(chainer.dataset.DatasetMixin):
             img_size=(224, 224),
             img_mean='imagenet',
             preload_features=False,
+            feature_store=None,
+            feature_dtype=None,
+            cache_bytes=0,
+            preload_workers=4,
+            preload_cache=None,
+            share_features=False,
+            shm_dir=DEFAULT_SHM_DIR,
+            img_cache=None,
+            decode_workers=4,
+            fast_decode=False,
+            augmentation=None,
+            profiler=None,
+            rank=0,
+            world_size=1,
     ):
         """
         parameters
@@ -79,9 +149,12 @@ class IDGDatasetBase(chainer.dataset.DatasetMixin):
         dataset_path : str
             path to dataset which contains image info and captions
             preprocessed by mscoco2formatted.py and preprocess_tokens.py.
+            directory of columnar format is opened lazily with mmap.
 
         vocab_path : str
             path to vocabulary dictionary created by preprocess_tokens.py.
+            it can be empty if dataset is columnar format,
+            then vocabulary saved in the dataset is used.
 
         img_root : str
             path to directory of images.
@@ -105,35 +178,182 @@ class IDGDatasetBase(chainer.dataset.DatasetMixin):
 
         preload_features : bool, default False
             preload all image features onto RAM.
+
+        feature_store : str, default None
+            path to feature store created by utils/feature_store.py.
+            if it is set, image features are read from memory mapped file
+            and img_feature_root is not required.
+            if it is set with preload_features, features are read onto RAM
+            in the stored dtype, e.g. int8 store created by utils/quantize.py
+            needs a quarter of RAM of float32 features.
+
+        feature_dtype : numpy.dtype, default None
+            dtype of features returned from feature store.
+            int8 features are dequantized into this dtype(float32 if it is None)
+            for each sample in get_example and for each batch in get_examples.
+            e.g. numpy.float16 returns features of float16 store without conversion.
+
+        cache_bytes : int, default 0
+            upper bound of bytes to cache images or image features loaded on demand.
+            cache is used when raw_img is True or features are loaded one by one.
+            0 disables cache.
+
+        preload_workers : int, default 4
+            number of threads to read image features when preload_features is True.
+
+        preload_cache : str, default None
+            path to .npy file to save preloaded image features.
+            if the file already exists, it is opened with mmap instead of
+            reading each feature files again.
+            it has to be different for each rank when world_size is more than 1.
+
+        share_features : bool, default False
+            back preloaded image features with a file in shm_dir opened by mmap.
+            pickled dataset only contains the path to the file,
+            so worker processes of MultiprocessIterator share one copy of features.
+            the file is removed when close() is called.
+
+        shm_dir : str, default /dev/shm
+            directory to save the shared file when share_features is True.
+
+        img_cache : str, default None
+            path to image cache created by utils/image_cache.py.
+            if it is set with raw_img, pre-resized uint8 images are read from
+            memory mapped file and img_root is not required.
+            img_size has to be the same as the one used to build the cache.
+
+        decode_workers : int, default 4
+            number of threads to decode images of a batch in get_examples
+            when raw_img is True.
+
+        fast_decode : bool, default False
+            decode large JPEG in reduced resolution and resize images in uint8.
+            it is faster, but images with fine texture differ from the float32 path.
+            see ImgProcesser.load_img for the difference from the float32 path.
+
+        augmentation : BatchAugmentation, default None
+            random resized crop, flip and brightness jitter applied to raw images.
+            see utils/augmentation.py. augmentation.out_size has to be img_size,
+            and image cache has to be built with augmentation.src_size.
+            it can not be used with cache_bytes because cached images are not augmented again.
+
+        profiler : StageProfiler, default None
+            profiler to measure time of file open, npz decode, jpeg decode,
+            resize, mean substraction and caption creation,
+            and to count samples, bytes read and cache hits.
+            call profiler.snapshot() or profiler.report() to get the numbers.
+            if it is None, nothing is measured.
+
+        rank : int, default 0
+            rank of this process in data-parallel training(e.g. comm.rank of ChainerMN).
+
+        world_size : int, default 1
+            number of ranks in data-parallel training(e.g. comm.size of ChainerMN).
+            if it is more than 1, images are partitioned among ranks with
+            balanced caption counts, and this dataset contains only captions
+            of images owned by rank. every rank has the same number of captions,
+            because shards are padded to the largest one by repeating their own captions,
+            so ranks run the same number of iterations in an epoch.
+            preload_features also reads only those images into RAM,
+            both from .npz features and from feature store,
+            and memory mapped feature store only pages in rows of those images.
+            feature store of only those images can be built by
+            utils/feature_store.py with --rank and --world_size.
+            use this dataset on each rank instead of chainermn.scatter_dataset.
         """
 
-        if Path(dataset_path).exists():
-            dataset = self.load_data(dataset_path)
+        self.profiler = profiler if profiler is not None else NULL_PROFILER
+        self._word_ids = None
+        self._inv_word_ids = None
+
+        if is_columnar(dataset_path):
+            dataset = load_columnar(dataset_path)
             self.captions = dataset['captions']
             self.images = dataset['images']
+            self._inv_word_ids = dataset['vocab']
+        elif Path(dataset_path).exists():
+            dataset = self.load_data(dataset_path)
+            self.captions = PackedCaptions.from_dicts(dataset['captions'])
+            self.images = dataset['images']
         else:
             msg = 'File %s is not found.\n' % dataset_path
             raise FileNotFoundError(msg)
 
-        if Path(vocab_path).exists():
-            self.word_ids = self.load_data(vocab_path)
-        else:
+        if vocab_path and Path(vocab_path).exists():
+            self._word_ids = self.load_data(vocab_path)
+            self._inv_word_ids = None
+        elif vocab_path or self._inv_word_ids is None:
             msg = 'File %s is not found.\n' % vocab_path
             raise FileNotFoundError(msg)
 
-        self.cap2img = {
-            caption['caption_idx']: caption['img_idx'] for caption in self.captions
-        }
-        self.inv_word_ids = {
-            v: k for k, v in self.word_ids.items()
-        }
-
-        if raw_img and img_root:
-            self.img_proc = ImgProcesser(mean_type=img_mean)
+        self.rank = rank
+        self.world_size = world_size
+        self.shard_images = None
+        self.caption_indices = None
+        self.img_rows = None
+
+        if world_size > 1:
+            self.shard_images, self.caption_indices = shard_indices(
+                self.captions.cap2img,
+                rank,
+                world_size,
+                num_images=len(self.images),
+                force_equal_length=True
+            )
+            self.captions = self.captions.subset(self.caption_indices)
+            self.img_rows = np.full(len(self.images), -1, dtype=np.int64)
+            self.img_rows[self.shard_images] = np.arange(len(self.shard_images))
+
+        self.cap2img = self.captions.cap2img
+        self.stats = CorpusStatistics(
+            stats_path(dataset_path, rank=rank, world_size=world_size),
+            source_signature(dataset_path, vocab_path)
+        )
+
+        if raw_img and augmentation is not None:
+            if augmentation.out_size != tuple(img_size):
+                msg = 'out_size of augmentation %s is not img_size %s\n' % (
+                    augmentation.out_size, img_size
+                )
+                raise ValueError(msg)
+            if cache_bytes > 0:
+                msg = 'cache_bytes can not be used with augmentation. use img_cache instead.\n'
+                raise ValueError(msg)
+
+        self.feature_store = None
+        self.img_cache = None
+
+        if raw_img and img_cache:
+            self.img_proc = ImgProcesser(
+                mean_type=img_mean,
+                profiler=self.profiler,
+                workers=decode_workers,
+                fast_decode=fast_decode,
+                augmentation=augmentation
+            )
+            self.img_cache = FeatureStore(img_cache)
+            self.img_root = Path(img_root) if img_root else None
+            cache_size = augmentation.src_size if augmentation is not None else tuple(img_size)
+            if self.img_cache.shape[1::-1] != cache_size:
+                msg = 'image size of image cache %s is not %s\n' % (img_cache, cache_size)
+                raise ValueError(msg)
+        elif raw_img and img_root:
+            self.img_proc = ImgProcesser(
+                mean_type=img_mean,
+                profiler=self.profiler,
+                workers=decode_workers,
+                fast_decode=fast_decode,
+                augmentation=augmentation
+            )
             self.img_root = Path(img_root)
             if not self.img_root.exists() and not self.img_root.is_dir():
                 msg = "image root %s is not found\n" % str(self.img_root)
                 raise FileNotFoundError(msg)
+        elif not raw_img and feature_store:
+            self.feature_store = FeatureStore(feature_store, dtype=feature_dtype)
+            if preload_features:
+                # only images of this rank are read if images are sharded.
+                self.feature_store.load_into_memory(self.shard_images)
         elif not raw_img and img_feature_root:
             self.img_feature_root = Path(img_feature_root)
             if not self.img_feature_root.exists() and not self.img_feature_root.is_dir():
@@ -150,16 +370,43 @@ class IDGDatasetBase(chainer.dataset.DatasetMixin):
             msg = '%s has to be defined to load %s\n' % (img_path, img_type)
             raise NameError(msg)
 
-        if preload_features and not raw_img:
-            print("Loading image features...")
+        self.img_features = None
+        self.shared_features = None
 
-            self.img_features = np.array(
-                [
-                    np.load('{0}.npz'.format(
-                        self.img_feature_root / Path(image['file_path']).with_suffix("")
-                    ))['arr_0'] for image in tqdm(self.images)
-                ]
-            )
+        if preload_features and not raw_img and self.feature_store is None:
+            if preload_cache and Path(preload_cache).exists():
+                self.shared_features = SharedArray(preload_cache)
+            else:
+                if preload_cache:
+                    out_path, owner = preload_cache, False
+                elif share_features:
+                    out_path, owner = create_shared_path(shm_dir), True
+                else:
+                    out_path, owner = None, False
+
+                if self.shard_images is None:
+                    images = self.images
+                else:
+                    images = [self.images[img_idx] for img_idx in self.shard_images]
+
+                print("Loading image features...")
+                self.img_features = read_features(
+                    [
+                        feature_path(self.img_feature_root, image['file_path'])
+                        for image in images
+                    ],
+                    workers=preload_workers,
+                    out_path=out_path
+                )
+
+                if out_path is not None:
+                    self.img_features = None
+                    self.shared_features = SharedArray(out_path, owner=owner)
+
+            if self.shared_features is not None:
+                self.img_features = self.shared_features.array
+
+        self.cache = LRUCache(cache_bytes) if cache_bytes > 0 else None
 
         self.img_size = img_size
         self.raw_caption = raw_caption
@@ -169,6 +416,42 @@ class IDGDatasetBase(chainer.dataset.DatasetMixin):
     def __len__(self):
         return len(self.captions)
 
+    @property
+    def word_ids(self):
+        """map to ids from tokens."""
+        if self._word_ids is None:
+            self._word_ids = {
+                str(token): i for i, token in enumerate(self._inv_word_ids)
+            }
+        return self._word_ids
+
+    @property
+    def inv_word_ids(self):
+        """map to tokens from ids."""
+        if self._inv_word_ids is None:
+            self._inv_word_ids = {
+                v: k for k, v in self._word_ids.items()
+            }
+        return self._inv_word_ids
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if self.shared_features is not None:
+            # memory mapped features are reopened from shared file after unpickling.
+            state['img_features'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.shared_features is not None:
+            self.img_features = self.shared_features.array
+
+    def close(self):
+        """release preloaded image features and remove shared file if it is owned."""
+        self.img_features = None
+        if self.shared_features is not None:
+            self.shared_features.close()
+
     def get_example(self, i):
         """
         get image and caption based on caption index.
@@ -191,44 +474,250 @@ class IDGDatasetBase(chainer.dataset.DatasetMixin):
         This reads each images one by one.
         So it would take much time.
 
+        Use Image Cache
+        if self.raw_img is True and self.img_cache is set,
+        then pre-resized uint8 images are read from memory mapped image cache.
+        only float conversion and mean substraction are done for each image.
+
         Preload Features
         if self.preload_features is True, then preloaded feature vectores are used.
         It doesn't take times, but it consumes RAM.
         Be careful to use this functions if RAM is less than 16GM(in case of MSCOCO dataset).
 
+        Use Feature Store
+        if self.feature_store is set, then each feature vectors are
+        read from memory mapped feature store without copy.
+        It is as fast as preloaded features when the page cache is warm,
+        and doesn't require much RAM.
+
         Load Each Features one by one
         if self.raw_img and self.preload_features are both False,
         then each feature vectors are loaded one by one.
         if would take much time than using preloaded features,
         but doesn't require much RAM.
 
+        Cache
+        if self.cache is set, images or features loaded one by one are cached
+        by img_idx, so the other captions of the same image don't read the disk.
+        cached arrays are shared between captions, so don't modify them in place.
+
         Use Raw Caption
         if self.raw_caption is True, then it returns list of caption.
-        otherwise, it returns ndarray of caption.
+        otherwise, it returns ndarray of caption,
+        which is a view of self.captions.tokens.
         """
 
-        if self.raw_img:
-            img_path = self.img_root / self.images[self.cap2img[i]]['file_path']
+        img = self.load_feature(self.cap2img[i])
+
+        with self.profiler.stage('caption'):
+            if self.raw_caption:
+                caption = self.captions[i].tolist()
+            else:
+                caption = self.captions[i]
+        self.profiler.count('samples')
+
+        return img, caption
+
+    def get_examples(self, indices, padding=-1):
+        """
+        get batch of images and padded captions based on caption indices.
+
+        Parameters
+        ----------
+        indices: array-like
+            caption indices of images and captions.
+
+        padding: int, default -1
+            value to fill the positions after the end of each caption.
+
+        Returns
+        -------
+        imgs: numpy.ndarray
+            stacked images or image features of shape (B, ...).
+
+        captions: numpy.ndarray
+            int32 padded captions of shape (B, T).
+
+        lengths: numpy.ndarray
+            int32 length of each caption.
+
+        Notes
+        -----
+        preloaded features and feature store are gathered by fancy indexing
+        without calling get_example for each index.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        imgs = self.load_features(self.cap2img[indices])
+        with self.profiler.stage('caption'):
+            captions, lengths = self.captions.pad(indices, padding=padding)
+        self.profiler.count('samples', len(indices))
+
+        return imgs, captions, lengths
+
+    def get_grouped_examples(self, indices, padding=-1):
+        """
+        get batch of unique images and padded captions based on caption indices.
+
+        Parameters
+        ----------
+        indices: array-like
+            caption indices of images and captions.
+
+        padding: int, default -1
+            value to fill the positions after the end of each caption.
+
+        Returns
+        -------
+        imgs: numpy.ndarray
+            images or image features of unique images in the batch.
+
+        captions: numpy.ndarray
+            int32 padded captions of shape (B, T).
+
+        lengths: numpy.ndarray
+            int32 length of each caption.
+
+        img_rows: numpy.ndarray
+            int32 row in imgs for each caption.
+            imgs[img_rows] is the same as imgs returned by get_examples.
+
+        Notes
+        -----
+        each image is loaded and transferred only once even if
+        several captions of the same image are in the batch.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        img_indices, img_rows = np.unique(self.cap2img[indices], return_inverse=True)
+
+        imgs = self.load_features(img_indices)
+        with self.profiler.stage('caption'):
+            captions, lengths = self.captions.pad(indices, padding=padding)
+        self.profiler.count('samples', len(indices))
+
+        return imgs, captions, lengths, img_rows.astype(np.int32)
+
+    def load_feature(self, img_idx):
+        """
+        load an image or an image feature of img_idx.
+
+        Parameters
+        ----------
+        img_idx: int
+            image index in self.images.
+
+        Returns
+        -------
+        img: numpy.ndarray
+            image RGB values or image features extracted by CNN model beforehand.
+        """
+        if self.raw_img and self.img_cache is not None:
+            if self.img_proc.augmentation is not None:
+                return self.img_proc.augment(self.img_cache[img_idx][None])[0]
+            return self.img_proc.preprocess(self.img_cache[img_idx])
+
+        if not self.raw_img and self.feature_store is not None:
+            return self.feature_store[img_idx]
+
+        if not self.raw_img and self.preload_features:
+            return self.img_features[self.feature_rows(img_idx)]
+
+        if self.cache is not None:
+            img = self.cache.get(img_idx)
+            if img is not None:
+                self.profiler.count('cache_hits')
+                return img
+
+            self.profiler.count('cache_misses')
+            img = self.read_feature(img_idx)
+            self.cache.put(img_idx, img)
+            return img
+
+        return self.read_feature(img_idx)
+
+    def feature_rows(self, img_idx):
+        """return rows in self.img_features of img_idx."""
+        if self.img_rows is None:
+            return img_idx
+        return self.img_rows[img_idx]
+
+    def read_feature(self, img_idx):
+        """read an image or an image feature of img_idx from file."""
+        if self.raw_img and self.img_proc.augmentation is not None:
+            img_path = self.img_root / self.images[img_idx]['file_path']
+            img = self.img_proc.load_imgs([str(img_path)], img_size=self.img_size)[0]
+        elif self.raw_img:
+            img_path = self.img_root / self.images[img_idx]['file_path']
             img = self.img_proc.load_img(
                 str(img_path),
                 img_size=self.img_size,
                 resize=True,
                 expand_dim=False
             )
-
         else:
-            if self.preload_features:
-                img = self.img_features[self.cap2img[i]]
-            else:
-                img_path = Path(self.images[self.cap2img[i]]['file_path']).with_suffix("")
-                img = np.load('{0}.npz'.format(self.img_feature_root / img_path))['arr_0']
+            img = load_feature(
+                feature_path(self.img_feature_root, self.images[img_idx]['file_path']),
+                profiler=self.profiler
+            )
 
-        if self.raw_caption:
-            caption = self.captions[i]['caption']
-        else:
-            caption = np.array(self.captions[i]['caption'])
+        return img
 
-        return img, caption
+    def load_features(self, img_indices):
+        """
+        load images or image features of img_indices as one batch.
+
+        Parameters
+        ----------
+        img_indices: numpy.ndarray
+            image indices in self.images.
+
+        Returns
+        -------
+        imgs: numpy.ndarray
+            stacked images or image features of shape (len(img_indices), ...).
+        """
+        if self.raw_img and self.img_cache is not None:
+            if self.img_proc.augmentation is not None:
+                return self.img_proc.augment(self.img_cache[img_indices])
+            return self.img_proc.preprocess(self.img_cache[img_indices])
+
+        if not self.raw_img and self.feature_store is not None:
+            return self.feature_store[img_indices]
+
+        if not self.raw_img and self.preload_features:
+            return self.img_features[self.feature_rows(img_indices)]
+
+        if self.raw_img:
+            return self.load_imgs(img_indices)
+
+        return np.stack([self.load_feature(img_idx) for img_idx in img_indices])
+
+    def load_imgs(self, img_indices):
+        """
+        decode raw images of img_indices into one batch with multiple threads.
+        only images missing in self.cache are decoded if cache is enabled.
+        """
+        if self.cache is None:
+            return self.img_proc.load_imgs(
+                [str(self.img_root / self.images[img_idx]['file_path']) for img_idx in img_indices],
+                img_size=self.img_size
+            )
+
+        imgs = [self.cache.get(img_idx) for img_idx in img_indices]
+        missing = [n for n, img in enumerate(imgs) if img is None]
+        self.profiler.count('cache_hits', len(imgs) - len(missing))
+        self.profiler.count('cache_misses', len(missing))
+
+        if missing:
+            loaded = self.img_proc.load_imgs(
+                [str(self.img_root / self.images[img_indices[n]]['file_path']) for n in missing],
+                img_size=self.img_size
+            )
+            for n, img in zip(missing, loaded):
+                imgs[n] = img
+                # copy not to keep the whole batch alive in cache.
+                self.cache.put(img_indices[n], img.copy())
+
+        return np.stack(imgs)
 
     def get_raw_data(self, index):
         """
@@ -250,7 +739,7 @@ class IDGDatasetBase(chainer.dataset.DatasetMixin):
         img_path = self.images[self.cap2img[index]]['file_path']
         img_path = self.img_root / img_path
 
-        caption = self.captions[index]['captions']
+        caption = self.captions[index]
         raw_caption = self.index2token(caption)
 
         return img_path, raw_caption
@@ -285,10 +774,33 @@ class IDGDatasetBase(chainer.dataset.DatasetMixin):
 
     def calc_unk_ratio(self, data):
         """base function for callculate <UNK> ratio"""
-        unk = sum((np.array(s['caption']) == self.word_ids['<UNK>']).sum() for s in data)
-        words = sum(np.array(['caption']).size for s in data)
+        return round(unk_ratio(data.tokens, self.word_ids['<UNK>']), 3)
+
+    def statistics(self):
+        """
+        get statistics of captions.
+
+        Returns
+        -------
+        stats: dict
+            <UNK> ratio, length histogram, token frequencies, vocabulary coverage,
+            captions per image and so on. see utils/statistics.py for detail.
 
-        return round(float(unk / words), 3)
+        Notes
+        -----
+        statistics are computed with numpy over all captions only once,
+        and saved next to the dataset(e.g. train2014.stats.json).
+        they are computed again only when the dataset or vocabulary is changed.
+        """
+        return self.stats.get(
+            lambda: compute_statistics(
+                self.captions,
+                len(self.images),
+                len(self.inv_word_ids),
+                unk_id=self.word_ids['<UNK>'],
+                img_indices=self.shard_images
+            )
+        )
 
     @property
     def get_word_ids(self):
@@ -298,14 +810,17 @@ class IDGDatasetBase(chainer.dataset.DatasetMixin):
     @property
     def get_unk_ratio(self):
         """get <UNK> ratio in self.captions"""
-        return self.calc_unk_ratio([cap for cap in self.captions])
+        return round(self.statistics()['unk_ratio'], 3)
 
     @property
     def get_configurations(self):
         """get configurations"""
+        stats = self.statistics()
+
         res = {}
+        res['vocabulary_size'] = stats['vocabulary_size']
+        res['num_captions'] = stats['num_captions']
+        res['num_images'] = stats['num_images']
+        res['unk_ratio'] = round(stats['unk_ratio'], 3)
 
-        res['vocabulary_size'] = len(self.get_word_ids)
-        res['num_size'] = len(self.captions)
-        res['num_size'] = len(self.images)
-        res['unk_ratio'] = self.get_unk_ratio
+        return res
@@ -0,0 +1,195 @@
+"""
+Benchmark each loading mode of IDGDatasetBase on a synthetic dataset.
+
+It measures startup time, samples/sec, p50/p99 latency of get_example,
+samples/sec of get_examples and peak RSS for each mode,
+and writes the results as JSON so they can be compared across commits.
+
+Usage
+-----
+python -m benchmarks.bench_loading data/synthetic --out bench_output.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import platform
+import resource
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from utils.augmentation import BatchAugmentation
+
+
+def mode_kwargs(paths):
+    """return keyword arguments of IDGDatasetBase for each loading mode."""
+    augmentation = BatchAugmentation(src_size=(256, 256), brightness=0.2, seed=0)
+    features = {
+        'dataset_path': paths['dataset'],
+        'vocab_path': paths['vocab'],
+        'img_feature_root': paths['img_feature_root'],
+    }
+    images = {
+        'dataset_path': paths['dataset'],
+        'vocab_path': paths['vocab'],
+        'img_root': paths['img_root'],
+        'raw_img': True,
+    }
+
+    return {
+        'raw_img': dict(images),
+        'raw_img_cache': dict(images, cache_bytes=1 << 30),
+        'raw_img_fast_decode': dict(images, fast_decode=True),
+        'raw_img_augmentation': dict(images, augmentation=augmentation),
+        'img_cache': dict(images, img_cache=paths['img_cache']),
+        'img_cache_augmentation': dict(
+            images,
+            img_cache=paths['img_cache'],
+            augmentation=BatchAugmentation(brightness=0.2, seed=0)
+        ),
+        'features': dict(features),
+        'features_cache': dict(features, cache_bytes=1 << 30),
+        'preload': dict(features, preload_features=True),
+        'preload_shared': dict(features, preload_features=True, share_features=True),
+        'feature_store': dict(features, feature_store=paths['feature_store']),
+        'feature_store_fp16': dict(features, feature_store=paths['feature_store_float16']),
+        'feature_store_fp16_output': dict(
+            features,
+            feature_store=paths['feature_store_float16'],
+            feature_dtype=np.float16
+        ),
+        'feature_store_int8': dict(features, feature_store=paths['feature_store_int8']),
+        'columnar_feature_store': dict(
+            features,
+            dataset_path=paths['columnar'],
+            vocab_path='',
+            feature_store=paths['feature_store']
+        ),
+    }
+
+
+def run_mode(kwargs, num_samples, batch_size, seed):
+    """
+    benchmark one loading mode. This function runs in a fresh process,
+    so peak RSS is not affected by the other modes.
+    """
+    from IDGDataset import IDGDatasetBase
+
+    start = time.perf_counter()
+    dataset = IDGDatasetBase(**kwargs)
+    startup = time.perf_counter() - start
+
+    rng = np.random.RandomState(seed)
+    indices = rng.randint(len(dataset), size=num_samples)
+
+    latencies = np.empty(num_samples)
+    start = time.perf_counter()
+    for n, i in enumerate(indices):
+        sample_start = time.perf_counter()
+        dataset.get_example(i)
+        latencies[n] = time.perf_counter() - sample_start
+    elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for batch_start in range(0, num_samples, batch_size):
+        dataset.get_examples(indices[batch_start:batch_start + batch_size])
+    batch_elapsed = time.perf_counter() - start
+
+    dataset.close()
+
+    return {
+        'startup_sec': startup,
+        'samples_per_sec': num_samples / elapsed,
+        'batched_samples_per_sec': num_samples / batch_elapsed,
+        'p50_latency_ms': float(np.percentile(latencies, 50) * 1e3),
+        'p99_latency_ms': float(np.percentile(latencies, 99) * 1e3),
+        # ru_maxrss is KB on linux.
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def git_commit():
+    """return current git commit hash or empty string."""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def run_benchmarks(paths, modes=None, num_samples=2000, batch_size=64, seed=0):
+    """
+    benchmark loading modes each in a fresh process.
+
+    Returns
+    -------
+    results : dict
+        environment and results of each mode.
+    """
+    all_kwargs = mode_kwargs(paths)
+    modes = modes or list(all_kwargs)
+    ctx = multiprocessing.get_context('spawn')
+
+    results = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'num_samples': num_samples,
+        'batch_size': batch_size,
+        'modes': {},
+    }
+    for mode in modes:
+        print('benchmarking {0}...'.format(mode))
+        with ctx.Pool(1) as pool:
+            results['modes'][mode] = pool.apply(
+                run_mode, (all_kwargs[mode], num_samples, batch_size, seed)
+            )
+        print(json.dumps(results['modes'][mode], indent=2))
+
+    return results
+
+
+if __name__ == '__main__':
+    from benchmarks.synthetic import dataset_paths, make_synthetic_dataset
+
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('ROOT', type=str, nargs='?', default='',
+                        help='path to synthetic dataset. \
+                        it is created in a temporary directory if it is not set.')
+    parser.add_argument('--out', type=str, default='bench_output.json',
+                        help='path to output JSON')
+    parser.add_argument('--modes', type=str, nargs='+', default=None,
+                        help='loading modes to benchmark. all modes as a default.')
+    parser.add_argument('--num_images', type=int, default=1000,
+                        help='number of images of synthetic dataset')
+    parser.add_argument('--num_samples', type=int, default=2000,
+                        help='number of samples loaded in each mode')
+    parser.add_argument('--batch_size', type=int, default=64,
+                        help='batch size for get_examples')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        ROOT = Path(args.ROOT or tmp_dir)
+        if args.ROOT and Path(dataset_paths(ROOT)['dataset']).exists():
+            PATHS = {key: str(path) for key, path in dataset_paths(ROOT).items()}
+        else:
+            print('creating synthetic dataset...')
+            start = time.perf_counter()
+            PATHS = make_synthetic_dataset(ROOT, num_images=args.num_images)
+            print('created in {0:.1f} sec'.format(time.perf_counter() - start))
+
+        RESULTS = run_benchmarks(
+            PATHS,
+            modes=args.modes,
+            num_samples=args.num_samples,
+            batch_size=args.batch_size
+        )
+
+    with open(args.out, 'w') as f:
+        json.dump(RESULTS, f, indent=2)
@@ -0,0 +1,162 @@
+"""
+Generate synthetic dataset in the same format as the output of preprocess_tokens.py.
+
+It creates random JPEG images, .npz image features, dataset and vocabulary pickles,
+float32, float16 and int8 feature stores, so loading modes of IDGDatasetBase
+can be benchmarked without downloading MSCOCO.
+"""
+
+import argparse
+import pickle
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+from tqdm import tqdm
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'DataPreparation'))
+
+from preprocess_tokens import save_columnar  # noqa: E402
+from utils.feature_store import build_feature_store, feature_path  # noqa: E402
+from utils.image_cache import build_image_cache  # noqa: E402
+from utils.quantize import MODES, quantize_feature_store  # noqa: E402
+
+
+def dataset_paths(root):
+    """return paths to each file of synthetic dataset under root."""
+    root = Path(root)
+    return {
+        'dataset': root / 'captions' / 'train2014.pkl',
+        'vocab': root / 'vocab' / 'train2014_vocab.pkl',
+        'img_root': root / 'images' / 'original',
+        'img_feature_root': root / 'images' / 'features',
+        'feature_store': root / 'images' / 'feature_store',
+        'feature_store_float16': root / 'images' / 'feature_store_float16',
+        'feature_store_int8': root / 'images' / 'feature_store_int8',
+        'img_cache': root / 'images' / 'img_cache',
+        'columnar': root / 'captions' / 'train2014',
+    }
+
+
+def make_synthetic_dataset(
+        root,
+        num_images=1000,
+        captions_per_image=5,
+        vocab_size=1000,
+        caption_length=(8, 24),
+        img_shape=(480, 640),
+        feature_shape=(2048,),
+        img_size=(224, 224),
+        seed=0,
+):
+    """
+    create synthetic dataset under root.
+
+    Parameters
+    ----------
+    root : str
+        path to directory to save synthetic dataset.
+
+    num_images : int, default 1000
+        number of images.
+
+    captions_per_image : int, default 5
+        number of captions of each image.
+
+    vocab_size : int, default 1000
+        vocabulary size including <UNK>, <SOS> and <EOS>.
+
+    caption_length : tuple, default (8, 24)
+        range of number of tokens of each caption including <SOS> and <EOS>.
+
+    img_shape : tuple, default (480, 640)
+        height and width of each JPEG image.
+
+    feature_shape : tuple, default (2048,)
+        shape of each image feature.
+
+    img_size : tuple, default (224, 224)
+        image size of image cache.
+
+    seed : int, default 0
+        seed of random number generator.
+
+    Returns
+    -------
+    paths : dict
+        paths to 'dataset', 'vocab', 'img_root', 'img_feature_root',
+        'feature_store', 'feature_store_float16', 'feature_store_int8',
+        'img_cache' and 'columnar'.
+    """
+    rng = np.random.RandomState(seed)
+    paths = dataset_paths(root)
+    for key in ('dataset', 'vocab'):
+        paths[key].parent.mkdir(parents=True, exist_ok=True)
+
+    word_ids = {'<UNK>': 0, '<SOS>': 1, '<EOS>': 2}
+    for i in range(vocab_size - len(word_ids)):
+        word_ids['word{0}'.format(i)] = len(word_ids)
+
+    images = []
+    captions = []
+    for img_idx in tqdm(range(num_images)):
+        file_path = 'train2014/COCO_train2014_{0:012d}.jpg'.format(img_idx)
+        images.append({'file_path': file_path, 'img_idx': img_idx})
+
+        img_path = paths['img_root'] / file_path
+        img_path.parent.mkdir(parents=True, exist_ok=True)
+        img = rng.randint(0, 256, img_shape + (3,), dtype=np.uint8)
+        cv2.imwrite(str(img_path), img)
+
+        npz_path = Path(feature_path(paths['img_feature_root'], file_path))
+        npz_path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(str(npz_path), rng.rand(*feature_shape).astype(np.float32))
+
+        for _ in range(captions_per_image):
+            length = rng.randint(caption_length[0], caption_length[1] + 1)
+            caption = [1] + rng.randint(0, vocab_size, length - 2).tolist() + [2]
+            captions.append(
+                {'img_idx': img_idx,
+                 'caption': caption,
+                 'caption_idx': len(captions)}
+            )
+
+    with paths['dataset'].open('wb') as f:
+        pickle.dump({'images': images, 'captions': captions}, f, pickle.HIGHEST_PROTOCOL)
+    with paths['vocab'].open('wb') as f:
+        pickle.dump(word_ids, f, pickle.HIGHEST_PROTOCOL)
+
+    save_columnar(captions, images, word_ids, paths['columnar'])
+    build_feature_store(images, paths['img_feature_root'], paths['feature_store'])
+    for mode in MODES:
+        quantize_feature_store(paths['feature_store'], paths['feature_store_' + mode], mode=mode)
+    build_image_cache(images, paths['img_root'], paths['img_cache'], img_size=img_size)
+
+    return {key: str(path) for key, path in paths.items()}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('OUT', type=str,
+                        help='path to directory to save synthetic dataset')
+    parser.add_argument('--num_images', type=int, default=1000,
+                        help='number of images')
+    parser.add_argument('--captions_per_image', type=int, default=5,
+                        help='number of captions of each image')
+    parser.add_argument('--vocab_size', type=int, default=1000,
+                        help='vocabulary size')
+    parser.add_argument('--feature_shape', type=int, nargs='+', default=[2048],
+                        help='shape of each image feature')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='seed of random number generator')
+    args = parser.parse_args()
+
+    make_synthetic_dataset(
+        args.OUT,
+        num_images=args.num_images,
+        captions_per_image=args.captions_per_image,
+        vocab_size=args.vocab_size,
+        feature_shape=tuple(args.feature_shape),
+        seed=args.seed
+    )
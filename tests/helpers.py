@@ -0,0 +1,39 @@
+"""
+Small image and feature fixtures shared by tests.
+"""
+
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from utils.feature_store import feature_path
+
+
+def image_file_name(img_idx, ext='.jpg'):
+    """return MSCOCO style file name of img_idx like 'COCO_train2014_000000000003.jpg'."""
+    return 'COCO_train2014_{0:012d}{1}'.format(img_idx, ext)
+
+
+def make_images(num_images, ext='.jpg'):
+    """return images which contain 'file_path' and 'img_idx' like IDGDatasetBase.images."""
+    return [
+        {'file_path': 'train2014/' + image_file_name(i, ext), 'img_idx': i}
+        for i in range(num_images)
+    ]
+
+
+def write_images(images, img_root, shape=(24, 32)):
+    """write random uint8 images of shape (height, width) under img_root."""
+    for image in images:
+        path = Path(img_root) / image['file_path']
+        path.parent.mkdir(parents=True, exist_ok=True)
+        cv2.imwrite(str(path), np.random.randint(0, 256, tuple(shape) + (3,), dtype=np.uint8))
+
+
+def write_features(images, img_feature_root, features):
+    """write each feature as .npz of images under img_feature_root."""
+    for image, feature in zip(images, features):
+        path = Path(feature_path(img_feature_root, image['file_path']))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(str(path), feature)
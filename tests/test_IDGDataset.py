@@ -43,12 +43,23 @@ class TestIDGDatasetBase(unittest.TestCase):
             img_id = self.IDG_Dataset.cap2img[i]
             img_path = Path(self.IDG_Dataset.images[img_id]['file_path']).with_suffix("")
             img_feature_inter = np.load('{0}.npz'.format(self.img_feature_root / img_path))['arr_0']
-            caption_inter = self.IDG_Dataset.captions[i]['caption']
+            caption_inter = self.IDG_Dataset.captions[i].tolist()
 
             self.assertEqual(img_feature.any(), img_feature_inter.any())
             self.assertIsInstance(img_feature, np.ndarray)
             self.assertEqual(caption, caption_inter)
 
+    def test_get_examples(self):
+        indices = np.random.randint(len(self.IDG_Dataset), size=8)
+        imgs, captions, lengths = self.IDG_Dataset.get_examples(indices)
+
+        self.assertEqual(len(imgs), len(indices))
+        self.assertEqual(captions.shape, (len(indices), lengths.max()))
+        for i, index in enumerate(indices):
+            img_feature, caption = self.IDG_Dataset[index]
+            np.testing.assert_array_equal(imgs[i], img_feature)
+            self.assertEqual(captions[i, :lengths[i]].tolist(), caption)
+
     def test_index2token(self):
         randn = np.random.randint(len(self.IDG_Dataset))
         tokens = self.IDG_Dataset[randn][1]
@@ -58,6 +69,14 @@ class TestIDGDatasetBase(unittest.TestCase):
 
         self.assertEqual(tokens, reversed_tokens)
 
+    def test_packed_captions(self):
+        captions = self.IDG_Dataset.captions
+
+        self.assertEqual(captions.tokens.dtype, np.int32)
+        self.assertEqual(captions.cap2img.dtype, np.int32)
+        self.assertEqual(len(captions.offsets), len(captions) + 1)
+        self.assertEqual(captions.offsets[-1], captions.tokens.size)
+
     def test_word_ids(self):
         for token in self.IDG_Dataset.word_ids:
             word_id = self.IDG_Dataset.word_ids[token]
@@ -0,0 +1,64 @@
+import tempfile
+import unittest
+import numpy as np
+
+from IDGDataset import IDGDatasetBase
+from benchmarks.synthetic import make_synthetic_dataset
+
+
+class TestRawImg(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.paths = make_synthetic_dataset(
+            cls.tmp_dir.name, num_images=6, img_shape=(48, 64),
+            feature_shape=(8,), img_size=(32, 24)
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def dataset(self, **kwargs):
+        return IDGDatasetBase(
+            self.paths['dataset'],
+            self.paths['vocab'],
+            img_root=self.paths['img_root'],
+            raw_img=True,
+            img_size=(32, 24),
+            decode_workers=2,
+            **kwargs
+        )
+
+    def test_get_examples(self):
+        indices = np.array([0, 7, 3, 12, 29, 1])
+        for fast_decode in [False, True]:
+            dataset = self.dataset(fast_decode=fast_decode)
+            expected = np.stack([dataset.get_example(i)[0] for i in indices])
+
+            imgs = dataset.get_examples(indices)[0]
+            np.testing.assert_array_equal(imgs, expected)
+
+            imgs, _, _, img_rows = dataset.get_grouped_examples(indices)
+            np.testing.assert_array_equal(imgs[img_rows], expected)
+            dataset.close()
+
+    def test_cache(self):
+        # cached images are the same regardless of which method loaded them first.
+        indices = np.array([0, 7, 3, 12, 29, 1])
+        single = self.dataset(cache_bytes=1 << 20)
+        expected = np.stack([single.get_example(i)[0] for i in indices])
+        np.testing.assert_array_equal(single.get_examples(indices)[0], expected)
+
+        batched = self.dataset(cache_bytes=1 << 20)
+        imgs = batched.get_examples(indices)[0]
+        np.testing.assert_array_equal(np.stack([batched.get_example(i)[0] for i in indices]), imgs)
+        np.testing.assert_array_equal(imgs, expected)
+
+        single.close()
+        batched.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
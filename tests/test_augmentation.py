@@ -0,0 +1,57 @@
+import pickle
+import unittest
+import numpy as np
+
+from utils.augmentation import BatchAugmentation
+
+
+class TestBatchAugmentation(unittest.TestCase):
+
+    def setUp(self):
+        self.imgs = np.random.randint(0, 256, (6, 40, 48, 3), dtype=np.uint8)
+
+    def test_shape(self):
+        aug = BatchAugmentation(out_size=(32, 24), src_size=(48, 40), brightness=0.2, seed=0)
+        out = aug(self.imgs)
+
+        self.assertEqual(out.shape, (6, 24, 32, 3))
+        self.assertEqual(out.dtype, np.uint8)
+
+        out = aug(self.imgs.astype(np.float32))
+        self.assertEqual(out.dtype, np.float32)
+
+    def test_seed(self):
+        kwargs = {'out_size': (32, 24), 'src_size': (48, 40), 'brightness': 0.2, 'seed': 1}
+        np.testing.assert_array_equal(
+            BatchAugmentation(**kwargs)(self.imgs),
+            BatchAugmentation(**kwargs)(self.imgs)
+        )
+
+        aug = BatchAugmentation(**kwargs)
+        restored = pickle.loads(pickle.dumps(aug))
+        np.testing.assert_array_equal(aug(self.imgs), restored(self.imgs))
+
+    def test_identity(self):
+        # full crop without flip and jitter returns the same images.
+        aug = BatchAugmentation(
+            out_size=(48, 40), scale=(1., 1.), ratio=(1.2, 1.2), flip=False, seed=0
+        )
+        np.testing.assert_array_equal(aug(self.imgs), self.imgs)
+
+    def test_flip(self):
+        aug = BatchAugmentation(
+            out_size=(48, 40), scale=(1., 1.), ratio=(1.2, 1.2), flip=True, seed=0
+        )
+        out = aug(self.imgs)
+        for img, augmented in zip(self.imgs, out):
+            self.assertTrue(
+                np.array_equal(augmented, img) or np.array_equal(augmented, img[:, ::-1])
+            )
+
+    def test_invalid_size(self):
+        with self.assertRaises(ValueError):
+            BatchAugmentation(out_size=(64, 64), src_size=(48, 40))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+import numpy as np
+
+from utils.cache import LRUCache
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def setUp(self):
+        self.item = np.zeros(10, dtype=np.float32)
+        self.cache = LRUCache(max_bytes=3 * self.item.nbytes)
+
+    def test_get_or_load(self):
+        loaded = []
+
+        def loader(key):
+            loaded.append(key)
+            return self.item + key
+
+        for key in [0, 1, 0, 0, 2]:
+            np.testing.assert_array_equal(self.cache.get_or_load(key, loader), self.item + key)
+
+        self.assertEqual(loaded, [0, 1, 2])
+        self.assertEqual(self.cache.hits, 2)
+        self.assertEqual(self.cache.misses, 3)
+
+    def test_eviction(self):
+        for key in range(3):
+            self.cache.put(key, self.item)
+        self.cache.get(0)
+        self.cache.put(3, self.item)
+
+        self.assertIn(0, self.cache)
+        self.assertNotIn(1, self.cache)
+        self.assertEqual(self.cache.evictions, 1)
+        self.assertEqual(self.cache.nbytes, 3 * self.item.nbytes)
+
+    def test_too_large(self):
+        self.cache.put(0, np.zeros(100, dtype=np.float32))
+        self.assertEqual(len(self.cache), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+import numpy as np
+
+from utils.caption_store import PackedCaptions
+
+
+class TestPackedCaptions(unittest.TestCase):
+
+    def setUp(self):
+        self.captions = [
+            {'img_idx': 0, 'caption': [1, 5, 6, 2], 'caption_idx': 0},
+            {'img_idx': 0, 'caption': [1, 7, 2], 'caption_idx': 1},
+            {'img_idx': 1, 'caption': [1, 8, 9, 0, 2], 'caption_idx': 2},
+        ]
+        self.packed = PackedCaptions.from_dicts(self.captions)
+
+    def test_from_dicts(self):
+        self.assertEqual(len(self.packed), len(self.captions))
+        self.assertEqual(self.packed.tokens.dtype, np.int32)
+        self.assertEqual(self.packed.cap2img.tolist(), [0, 0, 1])
+        self.assertEqual(self.packed.lengths.tolist(), [4, 3, 5])
+
+    def test_getitem(self):
+        for caption in self.captions:
+            self.assertEqual(self.packed[caption['caption_idx']].tolist(), caption['caption'])
+
+        self.assertEqual(self.packed[-1].tolist(), self.captions[-1]['caption'])
+        self.assertIs(self.packed[0].base, self.packed.tokens)
+
+    def test_pad(self):
+        captions, lengths = self.packed.pad([2, 0], padding=-1)
+
+        self.assertEqual(captions.dtype, np.int32)
+        self.assertEqual(captions.shape, (2, 5))
+        self.assertEqual(lengths.tolist(), [5, 4])
+        self.assertEqual(captions[0].tolist(), [1, 8, 9, 0, 2])
+        self.assertEqual(captions[1].tolist(), [1, 5, 6, 2, -1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import pickle
+import tempfile
+import unittest
+from pathlib import Path
+import numpy as np
+
+from preprocess_tokens import save_columnar
+from utils.columnar import is_columnar, load_columnar
+
+
+class TestColumnar(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.out_dir = Path(self.tmp_dir.name, 'train2014')
+
+        self.word_ids = {'<UNK>': 0, '<SOS>': 1, '<EOS>': 2, 'a': 3, 'dog': 4}
+        self.images = [
+            {'file_path': 'train2014/COCO_train2014_000000000009.jpg', 'img_idx': 0},
+            {'file_path': 'train2014/COCO_train2014_000000000025.jpg', 'img_idx': 1},
+        ]
+        self.captions = [
+            {'img_idx': 0, 'caption': [1, 3, 4, 2], 'caption_idx': 0},
+            {'img_idx': 1, 'caption': [1, 4, 0, 2], 'caption_idx': 1},
+            {'img_idx': 1, 'caption': [1, 3, 2], 'caption_idx': 2},
+        ]
+
+        save_columnar(self.captions, self.images, self.word_ids, self.out_dir)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_load_columnar(self):
+        self.assertTrue(is_columnar(self.out_dir))
+        dataset = load_columnar(self.out_dir)
+
+        self.assertIsInstance(dataset['captions'].tokens, np.memmap)
+        for caption in self.captions:
+            self.assertEqual(
+                dataset['captions'][caption['caption_idx']].tolist(), caption['caption']
+            )
+        self.assertEqual(dataset['captions'].cap2img.tolist(), [0, 1, 1])
+        self.assertEqual(list(dataset['images']), self.images)
+        self.assertEqual(
+            {token: i for i, token in enumerate(dataset['vocab'])}, self.word_ids
+        )
+
+    def test_pickle(self):
+        captions = load_columnar(self.out_dir)['captions']
+        restored = pickle.loads(pickle.dumps(captions))
+
+        self.assertIsInstance(restored.tokens, np.memmap)
+        np.testing.assert_array_equal(restored.tokens, captions.tokens)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import tempfile
+import unittest
+from pathlib import Path
+import chainer
+import chainer.functions as F
+import cv2
+import numpy as np
+
+from tests.helpers import make_images, write_images
+from utils.extract_features import DONE_FILE, MODELS, extract_features, model_mean
+from utils.feature_store import FeatureStore
+
+
+class MeanModel(chainer.Chain):
+    """small model which returns channel means as 'pool5' and counts images."""
+
+    def __init__(self):
+        super().__init__()
+        self.num_images = 0
+
+    def __call__(self, x, layers):
+        self.num_images += len(x)
+        return {'pool5': F.mean(x, axis=(2, 3))}
+
+
+class TestExtractFeatures(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.img_root = Path(self.tmp_dir.name, 'images')
+        self.store_root = Path(self.tmp_dir.name, 'store')
+
+        self.images = make_images(7, ext='.png')
+        write_images(self.images, self.img_root, shape=(24, 32))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def extract(self, model, mean=None):
+        return extract_features(
+            self.images, self.img_root, self.store_root,
+            model=model, batch_size=3, img_size=(32, 24), workers=2, mean=mean
+        )
+
+    def test_extract_features(self):
+        report = self.extract(MeanModel())
+        store = FeatureStore(self.store_root)
+
+        self.assertEqual(report['extracted'], len(self.images))
+        self.assertEqual(store.shape, (3,))
+        self.assertTrue(np.load(str(self.store_root / DONE_FILE)).all())
+
+        img = cv2.imread(str(self.img_root / self.images[4]['file_path'])).astype(np.float32)
+        expected = img.mean(axis=(0, 1)) - np.array([103.939, 116.779, 123.68])
+        np.testing.assert_allclose(store[4], expected, rtol=1e-4)
+
+    def test_mean(self):
+        self.extract(MeanModel(), mean=[10., 20., 30.])
+
+        img = cv2.imread(str(self.img_root / self.images[2]['file_path'])).astype(np.float32)
+        expected = img.mean(axis=(0, 1)) - np.array([10., 20., 30.])
+        np.testing.assert_allclose(FeatureStore(self.store_root)[2], expected, rtol=1e-4)
+
+    def test_model_mean(self):
+        # means of prepare() in chainer.links.model.vision.
+        resnet_mean = [103.063, 115.903, 123.152]
+        for name in ['resnet50', 'resnet101', 'resnet152']:
+            model = MODELS[name].__new__(MODELS[name])
+            self.assertEqual(model_mean(model), resnet_mean)
+        vgg = MODELS['vgg16'].__new__(MODELS['vgg16'])
+        self.assertEqual(model_mean(vgg), 'imagenet')
+        self.assertEqual(model_mean(MeanModel()), 'imagenet')
+
+    def test_resume(self):
+        self.extract(MeanModel())
+        expected = np.array(FeatureStore(self.store_root).features)
+
+        done = np.load(str(self.store_root / DONE_FILE))
+        done[[1, 5]] = False
+        np.save(str(self.store_root / DONE_FILE), done)
+
+        model = MeanModel()
+        report = self.extract(model)
+
+        self.assertEqual(model.num_images, 2)
+        self.assertEqual(report['skipped'], len(self.images) - 2)
+        np.testing.assert_allclose(FeatureStore(self.store_root).features, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
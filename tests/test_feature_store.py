@@ -0,0 +1,62 @@
+import tempfile
+import unittest
+from pathlib import Path
+import numpy as np
+
+from tests.helpers import make_images, write_features
+from utils.feature_store import FeatureStore, build_feature_store, feature_path, read_features
+
+
+class TestFeatureStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.img_feature_root = Path(self.tmp_dir.name, 'features')
+        self.store_root = Path(self.tmp_dir.name, 'store')
+
+        self.images = make_images(5)
+        self.features = np.random.rand(5, 3, 4).astype(np.float32)
+        write_features(self.images, self.img_feature_root, self.features)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_build_feature_store(self):
+        store = build_feature_store(self.images, self.img_feature_root, self.store_root)
+
+        self.assertEqual(len(store), len(self.images))
+        self.assertEqual(store.shape, self.features.shape[1:])
+        self.assertEqual(store.dtype, self.features.dtype)
+
+        for image, feature in zip(self.images, self.features):
+            np.testing.assert_array_equal(store[image['img_idx']], feature)
+
+    def test_reopen(self):
+        build_feature_store(self.images, self.img_feature_root, self.store_root)
+        store = FeatureStore(self.store_root)
+
+        self.assertIsInstance(store.features, np.memmap)
+        np.testing.assert_array_equal(store[3], self.features[3])
+
+    def test_load_into_memory(self):
+        store = build_feature_store(self.images, self.img_feature_root, self.store_root)
+        store.load_into_memory([1, 3])
+
+        self.assertEqual(len(store.features), 2)
+        self.assertNotIn(0, store)
+        np.testing.assert_array_equal(store[np.array([3, 1])], self.features[[3, 1]])
+        with self.assertRaises(KeyError):
+            store[2]
+
+    def test_read_features(self):
+        paths = [feature_path(self.img_feature_root, image['file_path']) for image in self.images]
+
+        np.testing.assert_array_equal(read_features(paths, workers=2), self.features)
+
+        out_path = Path(self.tmp_dir.name, 'preload.npy')
+        read_features(paths, workers=2, out_path=out_path)
+        np.testing.assert_array_equal(np.load(str(out_path), mmap_mode='r'), self.features)
+
+
+if __name__ == '__main__':
+    unittest.main()
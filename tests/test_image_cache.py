@@ -0,0 +1,45 @@
+import tempfile
+import unittest
+from pathlib import Path
+import numpy as np
+
+from tests.helpers import make_images, write_images
+from utils.image_cache import build_image_cache
+from utils.process_image import ImgProcesser
+
+
+class TestImageCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.img_root = Path(self.tmp_dir.name, 'images')
+        self.store_root = Path(self.tmp_dir.name, 'cache')
+        self.img_size = (32, 24)
+
+        self.images = make_images(3, ext='.png')
+        write_images(self.images, self.img_root, shape=(48, 64))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_build_image_cache(self):
+        cache = build_image_cache(self.images, self.img_root, self.store_root, self.img_size)
+        img_proc = ImgProcesser(mean_type='imagenet')
+
+        self.assertEqual(cache.dtype, np.uint8)
+        self.assertEqual(cache.shape, (24, 32, 3))
+
+        for image in self.images:
+            expected = img_proc.load_img(
+                str(self.img_root / image['file_path']),
+                img_size=self.img_size,
+                expand_dim=False
+            )
+            img = img_proc.preprocess(cache[image['img_idx']])
+
+            self.assertEqual(img.shape, expected.shape)
+            np.testing.assert_allclose(img, expected, atol=1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,182 @@
+import io
+import tempfile
+import unittest
+
+import chainer
+import numpy as np
+
+from IDGDataset import IDGDatasetBase
+from benchmarks.synthetic import make_synthetic_dataset
+from utils.iterators import BucketIterator, ImageGroupedIterator, PrefetchIterator, SamplerIterator
+from utils.profiler import StageProfiler
+from utils.sampler import BucketBatchSampler
+
+
+class TestPrefetchIterator(unittest.TestCase):
+
+    def setUp(self):
+        self.lengths = np.random.RandomState(0).randint(5, 30, size=100)
+        self.dataset = list(range(len(self.lengths)))
+
+    def test_same_order_as_sampler_iterator(self):
+        serial = SamplerIterator(
+            self.dataset, BucketBatchSampler(self.lengths, 8, seed=0), repeat=True
+        )
+        prefetch = PrefetchIterator(
+            self.dataset, BucketBatchSampler(self.lengths, 8, seed=0), n_prefetch=3, repeat=True
+        )
+
+        for _ in range(3 * len(serial.sampler)):
+            self.assertEqual(next(prefetch), next(serial))
+            self.assertEqual(prefetch.epoch, serial.epoch)
+            self.assertEqual(prefetch.is_new_epoch, serial.is_new_epoch)
+
+        self.assertEqual(prefetch.stats()['batches'], 3 * len(serial.sampler))
+        prefetch.finalize()
+
+    def test_same_order_without_read_ahead(self):
+        for n_prefetch in (0, 1):
+            serial = SamplerIterator(
+                self.dataset, BucketBatchSampler(self.lengths, 8, seed=0), repeat=True
+            )
+            prefetch = PrefetchIterator(
+                self.dataset,
+                BucketBatchSampler(self.lengths, 8, seed=0),
+                n_prefetch=n_prefetch,
+                repeat=True
+            )
+
+            for _ in range(4 * len(serial.sampler)):
+                self.assertEqual(next(prefetch), next(serial))
+                self.assertEqual(prefetch.epoch, serial.epoch)
+            prefetch.finalize()
+
+    def test_no_repeat(self):
+        prefetch = PrefetchIterator(
+            self.dataset, BucketBatchSampler(self.lengths, 8, seed=0), repeat=False
+        )
+        examples = [example for batch in prefetch for example in batch]
+
+        self.assertEqual(sorted(examples), self.dataset)
+        prefetch.finalize()
+
+
+class TestSamplerIteratorSerialize(unittest.TestCase):
+
+    def setUp(self):
+        self.lengths = np.random.RandomState(0).randint(5, 30, size=100)
+        self.dataset = list(range(len(self.lengths)))
+
+    def resume(self, iterator, iterator_class):
+        f = io.BytesIO()
+        chainer.serializers.save_npz(f, iterator)
+        f.seek(0)
+        resumed = iterator_class(
+            self.dataset, BucketBatchSampler(self.lengths, 8, seed=1), repeat=True
+        )
+        chainer.serializers.load_npz(f, resumed)
+        return resumed
+
+    def test_resume_mid_epoch(self):
+        for iterator_class in (SamplerIterator, PrefetchIterator):
+            iterator = iterator_class(
+                self.dataset, BucketBatchSampler(self.lengths, 8, seed=0), repeat=True
+            )
+            seen = [example for _ in range(5) for example in next(iterator)]
+            resumed = self.resume(iterator, iterator_class)
+
+            self.assertEqual(resumed.current_position, 5)
+            self.assertEqual(resumed.epoch_detail, iterator.epoch_detail)
+            self.assertEqual(resumed.previous_epoch_detail, iterator.previous_epoch_detail)
+
+            while not resumed.is_new_epoch:
+                batch = next(resumed)
+                self.assertEqual(batch, next(iterator))
+                seen.extend(batch)
+            self.assertEqual(sorted(seen), self.dataset)
+
+            if iterator_class is PrefetchIterator:
+                iterator.finalize()
+                resumed.finalize()
+
+
+class TestDatasetIterators(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.paths = make_synthetic_dataset(
+            cls.tmp_dir.name, num_images=20, img_shape=(32, 32),
+            feature_shape=(8,), img_size=(32, 32)
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def setUp(self):
+        # features are read from .npz one by one, so bytes_read counts loaded images.
+        self.profiler = StageProfiler()
+        self.dataset = IDGDatasetBase(
+            self.paths['dataset'],
+            self.paths['vocab'],
+            img_feature_root=self.paths['img_feature_root'],
+            profiler=self.profiler
+        )
+        self.feature_bytes = 8 * np.dtype(np.float32).itemsize
+
+    def tearDown(self):
+        self.dataset.close()
+
+    def bytes_read(self):
+        return self.profiler.snapshot().get('bytes_read', 0)
+
+    def test_get_grouped_examples(self):
+        indices = np.random.RandomState(0).randint(0, len(self.dataset), size=16)
+        indices[:4] = [0, 1, 2, 3]  # captions of image 0.
+
+        img_indices = np.unique(self.dataset.cap2img[indices])
+
+        imgs, captions, lengths, img_rows = self.dataset.get_grouped_examples(indices)
+        self.assertEqual(self.bytes_read(), len(img_indices) * self.feature_bytes)
+
+        expected_imgs, expected_captions, expected_lengths = self.dataset.get_examples(indices)
+        np.testing.assert_array_equal(imgs[img_rows], expected_imgs)
+        np.testing.assert_array_equal(captions, expected_captions)
+        np.testing.assert_array_equal(lengths, expected_lengths)
+        self.assertEqual(len(imgs), len(img_indices))
+
+    def test_image_grouped_iterator(self):
+        iterator = ImageGroupedIterator(self.dataset, 4, repeat=False, seed=0)
+        seen = []
+        for _ in range(len(iterator.sampler)):
+            batch = iterator._batches[iterator.current_position]
+            before = self.bytes_read()
+            imgs, captions, lengths, img_rows = next(iterator)
+
+            img_indices = np.unique(self.dataset.cap2img[batch])
+            self.assertEqual(len(imgs), len(img_indices))
+            self.assertEqual(self.bytes_read() - before, len(img_indices) * self.feature_bytes)
+            np.testing.assert_array_equal(imgs[img_rows], self.dataset.get_examples(batch)[0])
+            np.testing.assert_array_equal(lengths, self.dataset.captions.lengths[batch])
+            seen.extend(batch.tolist())
+
+        self.assertTrue(iterator.is_new_epoch)
+        self.assertEqual(sorted(seen), list(range(len(self.dataset))))
+
+    def test_bucket_iterator(self):
+        iterator = BucketIterator(self.dataset, 8, repeat=False, seed=0)
+        captions = []
+        for batch in iterator:
+            self.assertLessEqual(len(batch), 8)
+            captions.extend(tuple(caption.tolist()) for _, caption in batch)
+
+        expected = [tuple(self.dataset[i][1].tolist()) for i in range(len(self.dataset))]
+        self.assertEqual(sorted(captions), sorted(expected))
+        self.assertEqual(iterator.tokens, int(self.dataset.captions.lengths.sum()))
+        self.assertGreater(iterator.padding_efficiency, 0.5)
+        self.assertLessEqual(iterator.padding_efficiency, 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from preprocess_all import format_split, process_all
+from preprocess_tokens import Tokenizer, create_captions, create_word_dict, encode_captions, load_pickle
+
+
+def write_mscoco(path, split, num_images):
+    images = [
+        {'id': i, 'file_name': 'COCO_{0}_{1:012d}.jpg'.format(split, i)}
+        for i in range(num_images)
+    ]
+    annotations = [
+        {'id': i * 2 + j, 'image_id': i, 'caption': 'A dog number {0} runs {1}.'.format(i % 3, j)}
+        for i in range(num_images) for j in range(2)
+    ]
+    with open(str(path), 'w') as f:
+        json.dump({'images': images, 'annotations': annotations}, f)
+
+
+class TestPreprocessAll(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp_dir.name)
+        write_mscoco(self.root / 'train.json', 'train2014', 6)
+        write_mscoco(self.root / 'val.json', 'val2014', 3)
+
+        self.tokenizer_config = {'lang': 'en', 'tokenize': False}
+        self.config = {'corpora': [{
+            'name': 'test',
+            'tokenizer': self.tokenizer_config,
+            'cutoff': 1,
+            'vocab_path': str(self.root / 'vocab.pkl'),
+            'token_cache': str(self.root / 'cache.sqlite'),
+            'splits': [
+                {'input': str(self.root / 'val.json'), 'output': str(self.root / 'out' / 'val.pkl')},
+                {'input': str(self.root / 'train.json'), 'output': str(self.root / 'out' / 'train.pkl'),
+                 'build_vocab': True},
+            ],
+        }]}
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_process_all(self):
+        process_all(self.config, concurrent=False)
+
+        tokenizer = Tokenizer(**self.tokenizer_config)
+        captions, images, word_counter = create_captions(format_split(self.root / 'train.json'), tokenizer)
+        word_ids = create_word_dict(word_counter, cutoff=1)
+        self.assertEqual(load_pickle(self.root / 'vocab.pkl'), word_ids)
+        self.assertEqual(
+            load_pickle(self.root / 'out' / 'train.pkl'),
+            {'images': images, 'captions': encode_captions(captions, word_ids)}
+        )
+
+        captions, images, _ = create_captions(format_split(self.root / 'val.json'), tokenizer)
+        self.assertEqual(
+            load_pickle(self.root / 'out' / 'val.pkl'),
+            {'images': images, 'captions': encode_captions(captions, word_ids)}
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
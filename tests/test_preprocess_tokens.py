@@ -0,0 +1,103 @@
+import copy
+import pickle
+import tempfile
+import unittest
+from pathlib import Path
+import numpy as np
+
+from preprocess_tokens import (
+    TokenCache, Tokenizer, create_captions, create_word_dict, encode_tokens,
+    save_columnar, save_dataset, token2index, tokenize_sentences
+)
+from tests.helpers import make_images
+
+
+class TestPreprocessTokens(unittest.TestCase):
+
+    def setUp(self):
+        self.tokenizer = Tokenizer(lang='en', tokenize=False)
+        self.formatted_data = [
+            {'file_path': image['file_path'],
+             'captions': ['A dog runs on {0} grass.'.format(i),
+                          'Two cats, sleeping!',
+                          'a man rides {0} bikes'.format(i % 3)]}
+            for i, image in enumerate(make_images(10))
+        ]
+
+    def test_tokenize_sentences(self):
+        sentences = [caption for img in self.formatted_data for caption in img['captions']]
+        expected = [self.tokenizer.pre_process(sen) for sen in sentences]
+
+        self.assertEqual(
+            tokenize_sentences(sentences, self.tokenizer, workers=2, chunk_size=4), expected
+        )
+
+    def test_workers(self):
+        serial = create_captions(self.formatted_data, self.tokenizer)
+        parallel = create_captions(self.formatted_data, self.tokenizer, workers=3, chunk_size=4)
+
+        self.assertEqual(
+            pickle.dumps(serial, pickle.HIGHEST_PROTOCOL),
+            pickle.dumps(parallel, pickle.HIGHEST_PROTOCOL)
+        )
+
+    def test_token_cache(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir, 'tokens.sqlite')
+            expected = create_captions(self.formatted_data, self.tokenizer)
+
+            cache = TokenCache(path, self.tokenizer.get_config())
+            self.assertEqual(
+                create_captions(self.formatted_data, self.tokenizer, cache=cache), expected
+            )
+            self.assertEqual((cache.hits, cache.misses), (0, 30))
+            cache.close()
+
+            cache = TokenCache(path, self.tokenizer.get_config())
+            self.assertEqual(
+                create_captions(self.formatted_data, self.tokenizer, cache=cache), expected
+            )
+            self.assertEqual(cache.hit_rate(), 1.0)
+            cache.close()
+
+            # different config does not share tokens.
+            other = Tokenizer(lang='en', tokenize=False, to_lower=False)
+            cache = TokenCache(path, other.get_config())
+            create_captions(self.formatted_data, other, cache=cache)
+            self.assertEqual(cache.hits, 0)
+            cache.close()
+
+    def test_encode_tokens(self):
+        captions, _, word_counter = create_captions(self.formatted_data, self.tokenizer)
+        word_ids = create_word_dict(word_counter, cutoff=5)
+        tokens, offsets = encode_tokens(captions, word_ids)
+
+        self.assertEqual(tokens.dtype, np.int32)
+        self.assertEqual(len(offsets), len(captions) + 1)
+        for i, caption in enumerate(captions):
+            self.assertEqual(
+                tokens[offsets[i]:offsets[i + 1]].tolist(),
+                token2index(caption['caption'], word_ids)
+            )
+
+    def test_save_dataset_columnar(self):
+        captions, images, word_counter = create_captions(self.formatted_data, self.tokenizer)
+        word_ids = create_word_dict(word_counter, cutoff=5)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            packed = Path(tmp_dir, 'packed')
+            save_dataset(copy.deepcopy(captions), images, word_ids, packed, columnar=True)
+
+            expected = Path(tmp_dir, 'expected')
+            for caption in captions:
+                caption['caption'] = token2index(caption['caption'], word_ids)
+            save_columnar(captions, images, word_ids, expected)
+
+            for name in ['tokens.npy', 'offsets.npy', 'cap2img.npy', 'file_paths.npy', 'vocab.npy']:
+                np.testing.assert_array_equal(
+                    np.load(str(packed / name)), np.load(str(expected / name))
+                )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import pickle
+import tempfile
+import unittest
+from pathlib import Path
+import cv2
+import numpy as np
+
+from utils.process_image import ImgProcesser, jpeg_size, reduced_decode_flag
+
+
+class TestImgProcesser(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.img_size = (32, 24)
+        self.img_paths = []
+        for i in range(5):
+            path = Path(self.tmp_dir.name, '{0}.png'.format(i))
+            cv2.imwrite(str(path), np.random.randint(0, 256, (48, 64, 3), dtype=np.uint8))
+            self.img_paths.append(str(path))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_load_imgs(self):
+        for fast_decode in [False, True]:
+            img_proc = ImgProcesser(mean_type='imagenet', workers=2, fast_decode=fast_decode)
+            imgs = img_proc.load_imgs(self.img_paths, img_size=self.img_size)
+
+            self.assertEqual(imgs.shape, (5, 3, 24, 32))
+            self.assertEqual(imgs.dtype, np.float32)
+            for img, path in zip(imgs, self.img_paths):
+                expected = img_proc.load_img(path, img_size=self.img_size, expand_dim=False)
+                np.testing.assert_array_equal(img, expected)
+
+    def test_load_imgs_missing(self):
+        img_proc = ImgProcesser(workers=2)
+        with self.assertRaises(FileNotFoundError):
+            img_proc.load_imgs(self.img_paths + ['not_found.png'], img_size=self.img_size)
+
+    def test_pickle(self):
+        img_proc = ImgProcesser(mean_type='imagenet', workers=2)
+        img_proc.load_imgs(self.img_paths, img_size=self.img_size)
+
+        restored = pickle.loads(pickle.dumps(img_proc))
+        np.testing.assert_array_equal(
+            restored.load_imgs(self.img_paths, img_size=self.img_size),
+            img_proc.load_imgs(self.img_paths, img_size=self.img_size)
+        )
+
+
+class TestFastDecode(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        rng = np.random.RandomState(0)
+        noise = rng.randint(0, 256, (480, 640, 3)).astype(np.uint8)
+        # textured image with little energy above the frequency kept by reduced decode.
+        self.img_path = str(Path(self.tmp_dir.name, 'large.jpg'))
+        cv2.imwrite(self.img_path, cv2.GaussianBlur(noise, (0, 0), 3))
+        self.noise_path = str(Path(self.tmp_dir.name, 'noise.jpg'))
+        cv2.imwrite(self.noise_path, noise)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_jpeg_size(self):
+        self.assertEqual(jpeg_size(np.fromfile(self.img_path, dtype=np.uint8)), (480, 640))
+        self.assertIsNone(jpeg_size(b'\x89PNG\r\n\x1a\n'))
+
+    def test_reduced_decode_flag(self):
+        self.assertEqual(reduced_decode_flag((480, 640), (224, 224)), cv2.IMREAD_REDUCED_COLOR_2)
+        self.assertEqual(reduced_decode_flag((480, 640), (32, 32)), cv2.IMREAD_REDUCED_COLOR_8)
+        self.assertEqual(reduced_decode_flag((480, 640), (320, 320)), cv2.IMREAD_COLOR)
+        self.assertEqual(reduced_decode_flag(None, (32, 32)), cv2.IMREAD_COLOR)
+
+    def test_tolerance(self):
+        # measured mean/max: 0.5/3.5 for (224, 224), 1.2/5.8 for (64, 48).
+        for img_size in [(224, 224), (64, 48)]:
+            fast = ImgProcesser(mean_type='imagenet', fast_decode=True)
+            slow = ImgProcesser(mean_type='imagenet')
+
+            img = fast.load_img(self.img_path, img_size=img_size)
+            expected = slow.load_img(self.img_path, img_size=img_size)
+
+            self.assertEqual(img.shape, expected.shape)
+            self.assertEqual(img.dtype, np.float32)
+            self.assertLess(np.abs(img - expected).mean(), 1.5)
+            self.assertLess(np.abs(img - expected).max(), 8.0)
+
+    def test_high_frequency(self):
+        # white noise differs by 20 in mean from the float32 path, which aliases,
+        # but reduced decode is closer to area interpolation of the full image.
+        for img_size in [(224, 224), (64, 48)]:
+            fast = ImgProcesser(fast_decode=True).read_img(self.noise_path, img_size)
+            slow = ImgProcesser().read_img(self.noise_path, img_size)
+            area = cv2.resize(cv2.imread(self.noise_path), img_size, interpolation=cv2.INTER_AREA)
+
+            fast_error = np.abs(fast.astype(np.float32) - area).mean()
+            slow_error = np.abs(slow.astype(np.float32) - area).mean()
+            self.assertGreater(np.abs(fast.astype(np.float32) - slow).mean(), 10.0)
+            self.assertLess(fast_error, slow_error)
+
+    def test_default(self):
+        self.assertFalse(ImgProcesser().fast_decode)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import pickle
+import unittest
+
+from utils.profiler import NULL_PROFILER, StageProfiler
+
+
+class TestStageProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.profiler = StageProfiler()
+
+    def test_snapshot(self):
+        for _ in range(3):
+            with self.profiler.stage('resize'):
+                pass
+        self.profiler.count('bytes_read', 10)
+        self.profiler.count('bytes_read', 5)
+
+        snapshot = self.profiler.snapshot(prefix='loader/')
+        self.assertEqual(snapshot['loader/calls/resize'], 3)
+        self.assertGreaterEqual(snapshot['loader/time/resize'], 0.)
+        self.assertEqual(snapshot['loader/bytes_read'], 15)
+
+        self.profiler.reset()
+        self.assertEqual(self.profiler.snapshot(), {})
+
+    def test_null_profiler(self):
+        with NULL_PROFILER.stage('resize'):
+            pass
+        NULL_PROFILER.count('samples')
+
+        self.assertEqual(NULL_PROFILER.snapshot(), {})
+
+    def test_pickle(self):
+        self.profiler.count('samples')
+        restored = pickle.loads(pickle.dumps(self.profiler))
+
+        self.assertEqual(restored.snapshot(), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
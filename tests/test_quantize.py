@@ -0,0 +1,66 @@
+import tempfile
+import unittest
+from pathlib import Path
+import numpy as np
+
+from tests.helpers import make_images, write_features
+from utils.feature_store import FeatureStore, build_feature_store
+from utils.quantize import REPORT_FILE, quantize_feature_store
+
+
+class TestQuantize(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        img_feature_root = Path(self.tmp_dir.name, 'features')
+        self.store_root = Path(self.tmp_dir.name, 'store')
+
+        images = make_images(6)
+        rng = np.random.RandomState(0)
+        self.features = (rng.rand(6, 4, 3) * np.arange(1, 5)[:, None]).astype(np.float32)
+
+        write_features(images, img_feature_root, self.features)
+        build_feature_store(images, img_feature_root, self.store_root, workers=1)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_int8(self):
+        out_root = Path(self.tmp_dir.name, 'int8')
+        report = quantize_feature_store(self.store_root, out_root, mode='int8', chunk_size=4)
+        store = FeatureStore(out_root)
+
+        self.assertTrue((out_root / REPORT_FILE).exists())
+        self.assertEqual(report['quantized_bytes'] * 4, report['original_bytes'])
+        self.assertEqual(store.features.dtype, np.int8)
+        self.assertEqual(store.dtype, np.float32)
+
+        # error is at most half of the step of each channel.
+        step = np.arange(1, 5)[:, None] / 255.
+        restored = store[np.arange(6)]
+        self.assertEqual(restored.dtype, np.float32)
+        self.assertTrue(np.all(np.abs(restored - self.features) <= step / 2 + 1e-6))
+        np.testing.assert_array_equal(store[2], restored[2])
+
+        store.load_into_memory()
+        self.assertNotIsInstance(store.features, np.memmap)
+        np.testing.assert_array_equal(store[np.arange(6)], restored)
+
+    def test_float16(self):
+        out_root = Path(self.tmp_dir.name, 'float16')
+        quantize_feature_store(self.store_root, out_root, mode='float16')
+
+        store = FeatureStore(out_root, dtype=np.float16)
+        self.assertEqual(store[1].dtype, np.float16)
+        np.testing.assert_allclose(store[1], self.features[1], rtol=1e-3)
+
+        store = FeatureStore(out_root, dtype=np.float32)
+        self.assertEqual(store[1].dtype, np.float32)
+
+    def test_invalid_mode(self):
+        with self.assertRaises(ValueError):
+            quantize_feature_store(self.store_root, Path(self.tmp_dir.name, 'out'), mode='int4')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+import numpy as np
+
+from utils.sampler import BucketBatchSampler, ImageGroupedBatchSampler, padding_efficiency
+
+
+class TestBucketBatchSampler(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.lengths = rng.randint(5, 30, size=1000)
+        self.batch_size = 32
+
+    def test_covers_all_captions(self):
+        sampler = BucketBatchSampler(self.lengths, self.batch_size, seed=0)
+        batches = sampler.get_batches()
+
+        self.assertEqual(len(batches), len(sampler))
+        self.assertEqual(sorted(np.concatenate(batches).tolist()), list(range(len(self.lengths))))
+        for batch in batches:
+            self.assertLessEqual(len(batch), self.batch_size)
+
+    def test_bucket_boundaries(self):
+        sampler = BucketBatchSampler(self.lengths, self.batch_size, bucket_boundaries=[10, 20])
+        for batch in sampler.get_batches():
+            self.assertEqual(len(np.unique(sampler.bucket_ids[batch])), 1)
+
+    def test_padding_efficiency(self):
+        sampler = BucketBatchSampler(self.lengths, self.batch_size, seed=0)
+        order = np.random.RandomState(0).permutation(len(self.lengths))
+        random_batches = np.array_split(order, len(sampler))
+
+        self.assertGreater(
+            sampler.padding_efficiency(),
+            padding_efficiency(self.lengths, random_batches)
+        )
+
+    def test_seed(self):
+        batches_a = BucketBatchSampler(self.lengths, self.batch_size, seed=1).get_batches()
+        batches_b = BucketBatchSampler(self.lengths, self.batch_size, seed=1).get_batches()
+
+        for batch_a, batch_b in zip(batches_a, batches_b):
+            np.testing.assert_array_equal(batch_a, batch_b)
+
+
+class TestImageGroupedBatchSampler(unittest.TestCase):
+
+    def setUp(self):
+        self.cap2img = np.random.RandomState(0).randint(0, 50, size=250)
+        self.batch_size = 8
+
+    def test_all_captions(self):
+        sampler = ImageGroupedBatchSampler(self.cap2img, self.batch_size, seed=0)
+        batches = sampler.get_batches()
+
+        self.assertEqual(len(batches), len(sampler))
+        self.assertEqual(sorted(np.concatenate(batches).tolist()), list(range(len(self.cap2img))))
+        for batch in batches:
+            self.assertLessEqual(len(np.unique(self.cap2img[batch])), self.batch_size)
+
+    def test_one_caption_per_image(self):
+        sampler = ImageGroupedBatchSampler(
+            self.cap2img, self.batch_size, captions_per_image=1, seed=0
+        )
+        images = np.concatenate([self.cap2img[batch] for batch in sampler.get_batches()])
+
+        self.assertEqual(sorted(images.tolist()), np.unique(self.cap2img).tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
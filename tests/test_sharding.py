@@ -0,0 +1,144 @@
+import pickle
+import tempfile
+import unittest
+import numpy as np
+
+from IDGDataset import IDGDatasetBase
+from benchmarks.synthetic import make_synthetic_dataset
+from utils.caption_store import PackedCaptions
+from utils.sharding import partition_images, shard_indices
+
+
+class TestSharding(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.cap2img = np.repeat(np.arange(100), rng.randint(3, 8, size=100)).astype(np.int32)
+        self.world_size = 4
+
+    def test_partition_images(self):
+        owner = partition_images(self.cap2img, self.world_size)
+        counts = np.bincount(owner[self.cap2img], minlength=self.world_size)
+
+        self.assertEqual(counts.sum(), len(self.cap2img))
+        self.assertLessEqual(counts.max() - counts.min(), 7)
+
+    def test_shard_indices(self):
+        all_images = []
+        all_captions = []
+        for rank in range(self.world_size):
+            img_indices, caption_indices = shard_indices(self.cap2img, rank, self.world_size)
+            self.assertTrue(np.isin(self.cap2img[caption_indices], img_indices).all())
+            all_images.extend(img_indices.tolist())
+            all_captions.extend(caption_indices.tolist())
+
+        self.assertEqual(sorted(all_images), list(range(100)))
+        self.assertEqual(sorted(all_captions), list(range(len(self.cap2img))))
+
+    def test_force_equal_length(self):
+        shards = [
+            shard_indices(self.cap2img, rank, self.world_size, force_equal_length=True)
+            for rank in range(self.world_size)
+        ]
+        counts = np.bincount(partition_images(self.cap2img, self.world_size)[self.cap2img])
+
+        for rank, (img_indices, caption_indices) in enumerate(shards):
+            self.assertEqual(len(caption_indices), counts.max())
+            self.assertTrue(np.isin(self.cap2img[caption_indices], img_indices).all())
+            # own captions come first, and padding repeats them.
+            unpadded = shard_indices(self.cap2img, rank, self.world_size)[1]
+            np.testing.assert_array_equal(caption_indices[:len(unpadded)], unpadded)
+            self.assertTrue(np.isin(caption_indices, unpadded).all())
+
+        with self.assertRaises(ValueError):
+            shard_indices(self.cap2img[:3], 0, self.world_size, force_equal_length=True)
+
+    def test_subset(self):
+        captions = PackedCaptions.from_dicts([
+            {'img_idx': img_idx, 'caption': [1, i, 2], 'caption_idx': i}
+            for i, img_idx in enumerate(self.cap2img)
+        ])
+        _, caption_indices = shard_indices(self.cap2img, 1, self.world_size)
+        subset = captions.subset(caption_indices)
+
+        self.assertEqual(len(subset), len(caption_indices))
+        for i, caption_idx in enumerate(caption_indices):
+            self.assertEqual(subset[i].tolist(), captions[caption_idx].tolist())
+            self.assertEqual(subset.cap2img[i], captions.cap2img[caption_idx])
+
+
+class TestShardedDataset(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        # 10 images of 5 captions are split into 20, 15 and 15 captions.
+        self.paths = make_synthetic_dataset(
+            self.tmp_dir.name, num_images=10, img_shape=(32, 32),
+            feature_shape=(8,), img_size=(32, 32)
+        )
+        self.world_size = 3
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_equal_length(self):
+        datasets = [
+            IDGDatasetBase(
+                self.paths['dataset'],
+                self.paths['vocab'],
+                img_feature_root=self.paths['img_feature_root'],
+                rank=rank,
+                world_size=self.world_size
+            )
+            for rank in range(self.world_size)
+        ]
+        whole = IDGDatasetBase(
+            self.paths['dataset'], self.paths['vocab'],
+            img_feature_root=self.paths['img_feature_root']
+        )
+
+        self.assertEqual({len(dataset) for dataset in datasets}, {20})
+        self.assertEqual(
+            sorted(set(np.concatenate([dataset.caption_indices for dataset in datasets]))),
+            list(range(len(whole)))
+        )
+        for dataset in datasets:
+            self.assertTrue(np.isin(dataset.cap2img, dataset.shard_images).all())
+            for i, caption_idx in enumerate(dataset.caption_indices):
+                img, caption = dataset[i]
+                expected_img, expected_caption = whole[caption_idx]
+                np.testing.assert_array_equal(img, expected_img)
+                np.testing.assert_array_equal(caption, expected_caption)
+
+        for dataset in datasets + [whole]:
+            dataset.close()
+
+    def test_preload_feature_store(self):
+        whole = IDGDatasetBase(
+            self.paths['dataset'], self.paths['vocab'], feature_store=self.paths['feature_store']
+        )
+        for rank in range(self.world_size):
+            dataset = IDGDatasetBase(
+                self.paths['dataset'],
+                self.paths['vocab'],
+                feature_store=self.paths['feature_store'],
+                preload_features=True,
+                rank=rank,
+                world_size=self.world_size
+            )
+            # 10 images are split into 4, 3 and 3 images.
+            self.assertEqual(len(dataset.feature_store.features), len(dataset.shard_images))
+            self.assertEqual(len(dataset.feature_store.features), 4 if rank == 0 else 3)
+
+            restored = pickle.loads(pickle.dumps(dataset.feature_store))
+            self.assertEqual(len(restored.features), len(dataset.shard_images))
+            for i in range(len(dataset)):
+                caption_idx = dataset.caption_indices[i]
+                np.testing.assert_array_equal(dataset[i][0], whole[caption_idx][0])
+                np.testing.assert_array_equal(restored[dataset.cap2img[i]], whole[caption_idx][0])
+            dataset.close()
+        whole.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
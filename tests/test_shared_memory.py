@@ -0,0 +1,42 @@
+import os
+import pickle
+import tempfile
+import unittest
+import numpy as np
+
+from utils.shared_memory import SharedArray, create_shared_path
+
+
+class TestSharedArray(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.array = np.random.rand(256, 256).astype(np.float32)
+        self.path = create_shared_path(self.tmp_dir.name)
+        np.save(self.path, self.array)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_pickle(self):
+        shared = SharedArray(self.path, owner=True)
+        restored = pickle.loads(pickle.dumps(shared))
+
+        self.assertLess(len(pickle.dumps(shared)), self.array.nbytes)
+        self.assertEqual(shared.__getstate__(), {'path': self.path})
+        self.assertFalse(restored.owner)
+        np.testing.assert_array_equal(restored.array, self.array)
+
+    def test_close(self):
+        shared = SharedArray(self.path, owner=True)
+        restored = pickle.loads(pickle.dumps(shared))
+
+        restored.close()
+        self.assertTrue(os.path.exists(self.path))
+
+        shared.close()
+        self.assertFalse(os.path.exists(self.path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from utils.caption_store import PackedCaptions
+from utils.statistics import CorpusStatistics, compute_statistics
+
+
+class TestStatistics(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.captions = PackedCaptions.from_dicts([
+            {'img_idx': 0, 'caption': [1, 3, 4, 2], 'caption_idx': 0},
+            {'img_idx': 0, 'caption': [1, 0, 2], 'caption_idx': 1},
+            {'img_idx': 1, 'caption': [1, 3, 0, 0, 2], 'caption_idx': 2},
+        ])
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_compute_statistics(self):
+        stats = compute_statistics(self.captions, num_images=3, vocab_size=6, unk_id=0)
+
+        self.assertEqual(stats['num_captions'], 3)
+        self.assertEqual(stats['num_tokens'], 12)
+        self.assertAlmostEqual(stats['unk_ratio'], 3 / 12)
+        self.assertEqual(stats['length_histogram'], [0, 0, 0, 1, 1, 1])
+        self.assertEqual(stats['token_frequencies'], [3, 3, 3, 2, 1, 0])
+        self.assertAlmostEqual(stats['vocabulary_coverage'], 5 / 6)
+        self.assertEqual(stats['captions_per_image_histogram'], [1, 1, 1])
+
+    def test_memoize(self):
+        path = Path(self.tmp_dir.name, 'train2014.stats.json')
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return compute_statistics(self.captions, num_images=2, vocab_size=6)
+
+        stats = CorpusStatistics(path, signature=[['train2014.pkl', 10, 0]]).get(compute)
+        saved = CorpusStatistics(path, signature=[['train2014.pkl', 10, 0]]).get(compute)
+        self.assertEqual(stats, saved)
+        self.assertEqual(len(calls), 1)
+
+        CorpusStatistics(path, signature=[['train2014.pkl', 11, 0]]).get(compute)
+        self.assertEqual(len(calls), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import io
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from mscoco2formatted import (
+    JSONStream, image_file_path, load_jsonl, make_formatted, make_groups, save_jsonl,
+    stream_formatted
+)
+from tests.helpers import image_file_name
+
+
+class TestStreamFormatted(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp_dir.name, 'captions.json')
+
+        images = [
+            {'id': 10 * i + 7, 'file_name': image_file_name(10 * i + 7),
+             'height': 480, 'width': 640}
+            for i in range(5)
+        ]
+        # annotations are not grouped by image_id in MSCOCO.
+        annotations = [
+            {'id': n, 'image_id': images[n % 5]['id'],
+             'caption': '写真 {0} of a dog, "quoted".'.format(n),
+             'tokenized_caption': '写真 {0}'.format(n)}
+            for n in range(17)
+        ]
+        self.dataset = {
+            'info': {'year': 2014, 'version': 1.0},
+            'images': images,
+            'licenses': [{'id': 1, 'name': 'license'}],
+            'annotations': annotations,
+        }
+        with self.path.open('w') as f:
+            json.dump(self.dataset, f, indent=1, ensure_ascii=False)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_json_stream(self):
+        f = io.StringIO('{"a": 12345, "b": [1, 22, {"c": 3}], "d": []}')
+        stream = JSONStream(f, chunk_size=3)
+        self.assertEqual(list(stream.items(('b', 'd'))), [('b', 1), ('b', 22), ('b', {'c': 3})])
+
+    def test_stream_formatted(self):
+        expected = make_formatted(
+            make_groups(self.dataset['annotations']), self.dataset['images']
+        )
+
+        for chunk_size in [5, 64, 1 << 20]:
+            self.assertEqual(list(stream_formatted(self.path, chunk_size=chunk_size)), expected)
+
+    def test_file_name_without_split(self):
+        self.dataset['images'][0]['file_name'] = '000000000007.jpg'
+        self.dataset['images'][1]['file_name'] = 'COCO_17.jpg'
+        with self.path.open('w') as f:
+            json.dump(self.dataset, f, ensure_ascii=False)
+
+        file_paths = [pairs['file_path'] for pairs in stream_formatted(self.path)]
+        self.assertEqual(file_paths[:3], [
+            '000000000007.jpg', 'COCO_17.jpg', 'train2014/COCO_train2014_000000000027.jpg'
+        ])
+        self.assertEqual(image_file_path('COCO_val2014_000000000042.jpg'),
+                         'val2014/COCO_val2014_000000000042.jpg')
+
+    def test_jsonl(self):
+        out_path = Path(self.tmp_dir.name, 'formatted.jsonl')
+        save_jsonl(stream_formatted(self.path), out_path)
+
+        self.assertEqual(list(load_jsonl(out_path)), list(stream_formatted(self.path)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+"""
+Bounded LRU cache for images and image features loaded on demand.
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    LRU cache bounded by total bytes of cached numpy.ndarray.
+
+    Attributes
+    ----------
+    max_bytes : int
+        upper bound of total bytes of cached arrays.
+
+    nbytes : int
+        total bytes of cached arrays.
+
+    hits : int
+        number of lookups found in cache.
+
+    misses : int
+        number of lookups not found in cache.
+
+    evictions : int
+        number of arrays evicted from cache.
+    """
+
+    def __init__(self, max_bytes):
+        """
+        Parameters
+        ----------
+        max_bytes : int
+            upper bound of total bytes of cached arrays.
+        """
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # each process has its own empty cache.
+        return {'max_bytes': self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(state['max_bytes'])
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        """return cached array of key and mark it as most recently used."""
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        """
+        cache value and evict least recently used arrays over max_bytes.
+        value larger than max_bytes is not cached.
+        """
+        if value.nbytes > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._data:
+                self.nbytes -= self._data.pop(key).nbytes
+
+            self._data[key] = value
+            self.nbytes += value.nbytes
+
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+                self.evictions += 1
+
+    def get_or_load(self, key, loader):
+        """return cached array of key, or load it by loader(key) and cache it."""
+        value = self.get(key)
+        if value is None:
+            value = loader(key)
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        """remove all cached arrays. counters are not reset."""
+        with self._lock:
+            self._data.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        """return cache counters as a dict."""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+            'entries': len(self._data),
+            'nbytes': self.nbytes,
+        }
@@ -0,0 +1,209 @@
+"""
+Packed caption storage to keep captions without python object overhead.
+
+All captions are concatenated into one flat int32 token array,
+and offsets[i]:offsets[i + 1] points the tokens of caption i.
+"""
+
+from pathlib import Path
+
+import numpy as np
+
+
+TOKENS_FILE = 'tokens.npy'
+OFFSETS_FILE = 'offsets.npy'
+CAP2IMG_FILE = 'cap2img.npy'
+
+
+class PackedCaptions:
+    """
+    CSR-style packed captions.
+
+    Attributes
+    ----------
+    tokens : numpy.ndarray
+        int32 array of all caption tokens concatenated.
+
+    offsets : numpy.ndarray
+        int64 array of size num_captions + 1.
+        tokens of caption i are tokens[offsets[i]:offsets[i + 1]].
+
+    cap2img : numpy.ndarray
+        int32 array of img_idx for each caption.
+    """
+
+    def __init__(self, tokens, offsets, cap2img):
+        """
+        Parameters
+        ----------
+        tokens : numpy.ndarray
+            flat array of all caption tokens.
+
+        offsets : numpy.ndarray
+            start position of each caption in tokens and the total length.
+
+        cap2img : numpy.ndarray
+            img_idx for each caption.
+        """
+        if len(offsets) != len(cap2img) + 1:
+            msg = 'size of offsets has to be number of captions + 1.\n'
+            raise ValueError(msg)
+
+        self.tokens = tokens
+        self.offsets = offsets
+        self.cap2img = cap2img
+        self.root = None
+        self.mmap_mode = None
+
+    @classmethod
+    def load(cls, root, mmap_mode='r'):
+        """
+        open packed captions saved in directory root.
+
+        Parameters
+        ----------
+        root : str
+            path to directory which contains tokens.npy, offsets.npy and cap2img.npy.
+
+        mmap_mode : str, default 'r'
+            mode to open arrays. see numpy.load for detail.
+
+        Returns
+        -------
+        PackedCaptions
+        """
+        root = Path(root)
+        captions = cls(
+            np.load(str(root / TOKENS_FILE), mmap_mode=mmap_mode),
+            np.load(str(root / OFFSETS_FILE), mmap_mode=mmap_mode),
+            np.load(str(root / CAP2IMG_FILE), mmap_mode=mmap_mode),
+        )
+        captions.root = root
+        captions.mmap_mode = mmap_mode
+
+        return captions
+
+    def save(self, root):
+        """save packed captions into directory root."""
+        root = Path(root)
+        root.mkdir(parents=True, exist_ok=True)
+
+        np.save(str(root / TOKENS_FILE), self.tokens)
+        np.save(str(root / OFFSETS_FILE), self.offsets)
+        np.save(str(root / CAP2IMG_FILE), self.cap2img)
+
+    def __getstate__(self):
+        if self.root is not None and self.mmap_mode is not None:
+            # memory mapped captions are reopened instead of being copied.
+            return {'root': self.root, 'mmap_mode': self.mmap_mode}
+        return self.__dict__
+
+    def __setstate__(self, state):
+        if 'tokens' in state:
+            self.__dict__.update(state)
+        else:
+            self.__dict__.update(self.load(state['root'], state['mmap_mode']).__dict__)
+
+    @classmethod
+    def from_dicts(cls, captions):
+        """
+        create packed captions from list of caption dicts.
+
+        Parameters
+        ----------
+        captions : list
+            list of dicts which contain 'img_idx', 'caption', 'caption_idx'
+            created by preprocess_tokens.py.
+
+        Returns
+        -------
+        PackedCaptions
+        """
+        captions = sorted(captions, key=lambda caption: caption['caption_idx'])
+
+        lengths = np.fromiter(
+            (len(caption['caption']) for caption in captions),
+            dtype=np.int64,
+            count=len(captions)
+        )
+        offsets = np.zeros(len(captions) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+
+        tokens = np.fromiter(
+            (token for caption in captions for token in caption['caption']),
+            dtype=np.int32,
+            count=offsets[-1]
+        )
+        cap2img = np.fromiter(
+            (caption['img_idx'] for caption in captions),
+            dtype=np.int32,
+            count=len(captions)
+        )
+
+        return cls(tokens, offsets, cap2img)
+
+    def __len__(self):
+        return len(self.cap2img)
+
+    def __getitem__(self, i):
+        """return tokens of caption i as a view of self.tokens."""
+        if i < 0:
+            i += len(self)
+        return self.tokens[self.offsets[i]:self.offsets[i + 1]]
+
+    def subset(self, indices):
+        """
+        return new packed captions which contain only captions of indices.
+        caption i of the result is caption indices[i] of self.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        starts = self.offsets[indices]
+        lengths = self.offsets[indices + 1] - starts
+
+        offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        positions = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+
+        return PackedCaptions(
+            np.ascontiguousarray(self.tokens[positions]),
+            offsets,
+            np.ascontiguousarray(self.cap2img[indices]),
+        )
+
+    @property
+    def lengths(self):
+        """number of tokens in each caption."""
+        return np.diff(self.offsets)
+
+    def pad(self, indices, padding=-1):
+        """
+        gather captions into a padded matrix.
+
+        Parameters
+        ----------
+        indices : array-like
+            caption indices to be gathered.
+
+        padding : int, default -1
+            value to fill the positions after the end of each caption.
+
+        Returns
+        -------
+        captions : numpy.ndarray
+            int32 array of shape (len(indices), max_length).
+
+        lengths : numpy.ndarray
+            int32 array of length of each caption.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        starts = self.offsets[indices]
+        lengths = (self.offsets[indices + 1] - starts).astype(np.int32)
+        max_length = int(lengths.max()) if len(lengths) else 0
+
+        positions = np.arange(max_length)
+        mask = positions < lengths[:, None]
+
+        captions = np.full((len(indices), max_length), padding, dtype=np.int32)
+        captions[mask] = self.tokens[(starts[:, None] + positions)[mask]]
+
+        return captions, lengths
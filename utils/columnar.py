@@ -0,0 +1,114 @@
+"""
+Columnar dataset format which is opened lazily with mmap.
+
+A columnar dataset is a directory written by preprocess_tokens.py with --columnar
+or DataPreparation/convert_columnar.py. It contains
+
+    tokens.npy: int32 array of all caption tokens concatenated.
+    offsets.npy: int64 array, tokens of caption i are tokens[offsets[i]:offsets[i + 1]].
+    cap2img.npy: int32 array of img_idx of each caption.
+    file_paths.npy: unicode array of file_path of each image ordered by img_idx.
+    vocab.npy: unicode array of tokens ordered by word id.
+"""
+
+from pathlib import Path
+
+import numpy as np
+
+from utils.caption_store import CAP2IMG_FILE, TOKENS_FILE, PackedCaptions
+
+
+FILE_PATHS_FILE = 'file_paths.npy'
+VOCAB_FILE = 'vocab.npy'
+
+
+class ImageTable:
+    """
+    sequence of image information backed by string array.
+
+    Each item is a dict which contains 'file_path' and 'img_idx'
+    like images created by preprocess_tokens.py.
+
+    Attributes
+    ----------
+    file_paths : numpy.ndarray
+        unicode array of file_path of each image ordered by img_idx.
+    """
+
+    def __init__(self, file_paths):
+        self.file_paths = file_paths
+
+    def __len__(self):
+        return len(self.file_paths)
+
+    def __getitem__(self, img_idx):
+        if isinstance(img_idx, slice):
+            return [self[i] for i in range(*img_idx.indices(len(self)))]
+
+        if img_idx < 0:
+            img_idx += len(self)
+        return {'file_path': str(self.file_paths[img_idx]), 'img_idx': int(img_idx)}
+
+    def __iter__(self):
+        for img_idx in range(len(self)):
+            yield self[img_idx]
+
+
+def is_columnar(path):
+    """return True if path is a directory of columnar dataset."""
+    return Path(path).is_dir() and (Path(path) / TOKENS_FILE).exists()
+
+
+def load_columnar(path, mmap_mode='r'):
+    """
+    open columnar dataset.
+
+    Parameters
+    ----------
+    path : str
+        path to directory of columnar dataset.
+
+    mmap_mode : str, default 'r'
+        mode to open arrays. see numpy.load for detail.
+
+    Returns
+    -------
+    dataset : dict
+        dict which contains 'captions'(PackedCaptions), 'images'(ImageTable)
+        and 'vocab'(numpy.ndarray of tokens ordered by word id).
+    """
+    path = Path(path)
+    if not is_columnar(path):
+        msg = 'Directory %s is not a columnar dataset.\n' % str(path)
+        raise FileNotFoundError(msg)
+
+    return {
+        'captions': PackedCaptions.load(path, mmap_mode=mmap_mode),
+        'images': ImageTable(np.load(str(path / FILE_PATHS_FILE), mmap_mode=mmap_mode)),
+        'vocab': np.load(str(path / VOCAB_FILE), mmap_mode=mmap_mode),
+    }
+
+
+def load_images(dataset_path):
+    """
+    load only images of dataset created by preprocess_tokens.py.
+    both pickle(json) and columnar format are supported.
+    """
+    if is_columnar(dataset_path):
+        return ImageTable(np.load(str(Path(dataset_path) / FILE_PATHS_FILE)))
+
+    from IDGDataset import IDGDatasetBase
+    return IDGDatasetBase.load_data(dataset_path)['images']
+
+
+def load_cap2img(dataset_path):
+    """
+    load only img_idx of each caption of dataset created by preprocess_tokens.py.
+    both pickle(json) and columnar format are supported.
+    """
+    if is_columnar(dataset_path):
+        return np.load(str(Path(dataset_path) / CAP2IMG_FILE))
+
+    from IDGDataset import IDGDatasetBase
+    captions = IDGDatasetBase.load_data(dataset_path)['captions']
+    return PackedCaptions.from_dicts(captions).cap2img
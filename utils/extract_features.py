@@ -0,0 +1,274 @@
+"""
+Extract image features with a pretrained CNN into a feature store.
+
+Images are decoded by ImgProcesser on background threads while the CNN
+runs on the previous batch, and features are written straight into
+features.npy of a feature store(see utils/feature_store.py).
+Extracted rows are recorded in done.npy, so interrupted extraction
+is resumed by running the same command again.
+
+Usage
+-----
+python -m utils.extract_features \
+    data/captions/converted/MSCOCO_captions/train2014.pkl \
+    data/images/original \
+    data/images/features/ResNet50_train2014_store
+"""
+
+import argparse
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import chainer
+import numpy as np
+from tqdm import tqdm
+
+from utils.feature_store import FEATURE_FILE, INDEX_FILE, save_index
+from utils.process_image import ImgProcesser
+
+
+DONE_FILE = 'done.npy'
+MODELS = {
+    'resnet50': chainer.links.ResNet50Layers,
+    'resnet101': chainer.links.ResNet101Layers,
+    'resnet152': chainer.links.ResNet152Layers,
+    'vgg16': chainer.links.VGG16Layers,
+}
+# BGR mean pixel substracted by prepare() of each model.
+MEANS = {
+    chainer.links.ResNet50Layers: [103.063, 115.903, 123.152],
+    chainer.links.ResNet101Layers: [103.063, 115.903, 123.152],
+    chainer.links.ResNet152Layers: [103.063, 115.903, 123.152],
+    chainer.links.VGG16Layers: 'imagenet',
+}
+
+
+def model_mean(model):
+    """return mean_type of ImgProcesser for model, or 'imagenet' if model is not in MEANS."""
+    for model_class, mean in MEANS.items():
+        if isinstance(model, model_class):
+            return mean
+    return 'imagenet'
+
+
+def open_output(store_root, num_images):
+    """
+    open features.npy and done.npy of interrupted extraction.
+
+    Returns
+    -------
+    features : numpy.memmap or None
+        features of shape (num_images, *feature_shape) opened in r+ mode.
+        None if extraction is not started yet.
+
+    done : numpy.ndarray or None
+        bool array which is True for extracted rows.
+    """
+    feature_file = store_root / FEATURE_FILE
+    done_file = store_root / DONE_FILE
+    if not feature_file.exists() or not done_file.exists():
+        return None, None
+
+    features = np.lib.format.open_memmap(str(feature_file), mode='r+')
+    done = np.load(str(done_file))
+    if len(features) != num_images or len(done) != num_images:
+        msg = 'number of images is different from interrupted extraction in %s\n' % store_root
+        raise ValueError(msg)
+
+    return features, done
+
+
+def check_index(store_root, images):
+    """save index.npy, or check that it is the same as the one of interrupted extraction."""
+    img_indices = [image['img_idx'] for image in images]
+    index_file = store_root / INDEX_FILE
+
+    if index_file.exists() and (store_root / DONE_FILE).exists():
+        expected = np.full(max(img_indices) + 1, -1, dtype=np.int64)
+        expected[img_indices] = np.arange(len(img_indices))
+        if not np.array_equal(np.load(str(index_file)), expected):
+            msg = 'images are different from those of interrupted extraction in %s\n' % store_root
+            raise ValueError(msg)
+    else:
+        save_index(store_root, img_indices)
+
+
+def extract_features(
+        images,
+        img_root,
+        store_root,
+        model=None,
+        layer='pool5',
+        batch_size=32,
+        img_size=(224, 224),
+        workers=4,
+        n_prefetch=2,
+        save_every=100,
+        mean=None,
+):
+    """
+    extract features of images by a CNN into a feature store.
+
+    Parameters
+    ----------
+    images : list
+        list of images which contain 'file_path' and 'img_idx'.
+        This is the same as IDGDatasetBase.images.
+
+    img_root : str
+        path to directory of images.
+
+    store_root : str
+        path to directory to save feature store.
+
+    model : chainer.Link, default None
+        model called as model(x, layers=[layer]) like chainer.links.ResNet50Layers.
+        ResNet50Layers with pretrained weights is used if it is None.
+
+    layer : str, default 'pool5'
+        name of layer to extract features.
+
+    batch_size : int, default 32
+        number of images in each batch.
+
+    img_size : tuple, default (224, 224)
+        input image size of the model.
+
+    workers : int, default 4
+        number of threads to decode images of a batch.
+
+    n_prefetch : int, default 2
+        number of batches decoded ahead of inference.
+
+    save_every : int, default 100
+        done.npy is saved every save_every batches.
+
+    mean : str or list of size three, default None
+        mean_type of ImgProcesser substracted from images.
+        if it is None, the same mean as prepare() of model is chosen from MEANS,
+        and 'imagenet' is used for models which are not in MEANS.
+
+    Returns
+    -------
+    report : dict
+        number of extracted and skipped images, images/sec,
+        and seconds spent waiting for decode and running the model.
+    """
+    store_root = Path(store_root)
+    store_root.mkdir(parents=True, exist_ok=True)
+    check_index(store_root, images)
+
+    if model is None:
+        model = chainer.links.ResNet50Layers()
+
+    if mean is None:
+        mean = model_mean(model)
+    img_proc = ImgProcesser(mean_type=mean, workers=workers)
+    img_paths = [str(Path(img_root) / image['file_path']) for image in images]
+
+    features, done = open_output(store_root, len(images))
+    rows = np.arange(len(images)) if done is None else np.flatnonzero(~done)
+    batches = [rows[i:i + batch_size] for i in range(0, len(rows), batch_size)]
+
+    def submit(executor, batch):
+        return executor.submit(img_proc.load_imgs, [img_paths[r] for r in batch], img_size)
+
+    decode_time = 0.
+    model_time = 0.
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        futures = deque(submit(executor, batch) for batch in batches[:n_prefetch])
+
+        try:
+            for n, batch in enumerate(tqdm(batches)):
+                wait_start = time.perf_counter()
+                x = futures.popleft().result()
+                if n + n_prefetch < len(batches):
+                    futures.append(submit(executor, batches[n + n_prefetch]))
+
+                model_start = time.perf_counter()
+                decode_time += model_start - wait_start
+                with chainer.using_config('train', False), \
+                        chainer.using_config('enable_backprop', False):
+                    y = model(x, layers=[layer])[layer]
+                y = chainer.backends.cuda.to_cpu(y.array)
+                model_time += time.perf_counter() - model_start
+
+                if features is None:
+                    features = np.lib.format.open_memmap(
+                        str(store_root / FEATURE_FILE),
+                        mode='w+',
+                        dtype=y.dtype,
+                        shape=(len(images),) + y.shape[1:]
+                    )
+                    done = np.zeros(len(images), dtype=bool)
+                elif features.shape[1:] != y.shape[1:]:
+                    msg = 'feature shape %s is different from %s of interrupted extraction\n' % (
+                        y.shape[1:], features.shape[1:]
+                    )
+                    raise ValueError(msg)
+                features[batch] = y
+                done[batch] = True
+
+                if (n + 1) % save_every == 0:
+                    features.flush()
+                    np.save(str(store_root / DONE_FILE), done)
+        finally:
+            # progress is saved even if extraction is interrupted.
+            if features is not None:
+                features.flush()
+                np.save(str(store_root / DONE_FILE), done)
+
+    elapsed = time.perf_counter() - start
+    del features
+
+    return {
+        'extracted': int(len(rows)),
+        'skipped': int(len(images) - len(rows)),
+        'images_per_sec': len(rows) / elapsed if elapsed > 0 else 0.,
+        'decode_wait_sec': decode_time,
+        'model_sec': model_time,
+    }
+
+
+if __name__ == '__main__':
+    from utils.columnar import load_images
+
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('DATASET', type=str,
+                        help='path to dataset created by preprocess_tokens.py')
+    parser.add_argument('IMG_ROOT', type=str,
+                        help='path to directory of images')
+    parser.add_argument('OUT', type=str,
+                        help='path to directory to save feature store')
+    parser.add_argument('--model', type=str, choices=sorted(MODELS), default='resnet50',
+                        help='pretrained CNN to extract features')
+    parser.add_argument('--layer', type=str, default='pool5',
+                        help='name of layer to extract features')
+    parser.add_argument('--batch_size', type=int, default=32,
+                        help='number of images in each batch')
+    parser.add_argument('--img_size', type=int, nargs=2, default=[224, 224],
+                        help='input image size(width height)')
+    parser.add_argument('--workers', type=int, default=4,
+                        help='number of threads to decode images')
+    parser.add_argument('--save_every', type=int, default=100,
+                        help='save progress every this number of batches')
+    args = parser.parse_args()
+
+    REPORT = extract_features(
+        load_images(args.DATASET),
+        args.IMG_ROOT,
+        args.OUT,
+        model=MODELS[args.model](),
+        layer=args.layer,
+        batch_size=args.batch_size,
+        img_size=tuple(args.img_size),
+        workers=args.workers,
+        save_every=args.save_every
+    )
+    print('extracted {extracted} images, skipped {skipped} images, '
+          '{images_per_sec:.1f} images/sec'.format(**REPORT))
@@ -0,0 +1,349 @@
+"""
+Consolidated feature store to load image features without per-file overhead.
+
+A feature store is a directory which contains two files.
+
+    features.npy: numpy.ndarray of shape (num_images, *feature_shape)
+        all image features saved contiguously.
+    index.npy: numpy.ndarray of shape (max_img_idx + 1,)
+        row number in features.npy for each img_idx. -1 if it is missing.
+
+and quantization.npz which contains scale and zero_point of each channel
+if features are quantized into int8 by utils/quantize.py.
+
+features.npy is opened with mmap, so each row is returned without copy.
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from tqdm import tqdm
+
+from utils.profiler import NULL_PROFILER
+
+
+FEATURE_FILE = 'features.npy'
+INDEX_FILE = 'index.npy'
+QUANT_FILE = 'quantization.npz'
+
+
+def feature_path(img_feature_root, file_path):
+    """return path to .npz feature file related to image file_path."""
+    return '{0}.npz'.format(Path(img_feature_root) / Path(file_path).with_suffix(""))
+
+
+def load_feature(path, profiler=NULL_PROFILER):
+    """load image feature saved as .npz file."""
+    with profiler.stage('file_open'):
+        f = np.load(path)
+
+    with f:
+        with profiler.stage('npz_decode'):
+            feature = f['arr_0']
+
+    profiler.count('bytes_read', feature.nbytes)
+
+    return feature
+
+
+def dequantize(q, scale, zero_point, dtype=np.float32):
+    """
+    dequantize int8 features.
+
+    Parameters
+    ----------
+    q : numpy.ndarray
+        int8 features of shape (C, ...) or a batch of shape (N, C, ...).
+
+    scale : numpy.ndarray
+        scale of each channel of shape (C, 1, ...).
+
+    zero_point : numpy.ndarray
+        zero point of each channel of shape (C, 1, ...).
+
+    dtype : numpy.dtype, default numpy.float32
+        dtype of dequantized features.
+
+    Returns
+    -------
+    numpy.ndarray
+        dequantized features.
+    """
+    res = q.astype(np.float32)
+    res -= zero_point
+    res *= scale
+    return res.astype(dtype, copy=False)
+
+
+def read_features(paths, workers=4, out_path=None):
+    """
+    read .npz features into one array allocated only once.
+
+    Parameters
+    ----------
+    paths : list
+        list of paths to .npz feature files.
+
+    workers : int, default 4
+        number of threads to read feature files.
+        numpy releases GIL while decompressing and copying arrays.
+
+    out_path : str, default None
+        if it is set, features are written into .npy file at out_path
+        through memory mapped array instead of RAM.
+
+    Returns
+    -------
+    features : numpy.ndarray or numpy.memmap
+        features of shape (len(paths), *feature_shape).
+        the first file decides shape and dtype of each feature.
+    """
+    first = load_feature(paths[0])
+    shape = (len(paths),) + first.shape
+
+    if out_path is None:
+        features = np.empty(shape, dtype=first.dtype)
+    else:
+        features = np.lib.format.open_memmap(
+            str(out_path), mode='w+', dtype=first.dtype, shape=shape
+        )
+    features[0] = first
+
+    def fill(row):
+        features[row] = load_feature(paths[row])
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for _ in tqdm(executor.map(fill, range(1, len(paths))), total=len(paths) - 1):
+            pass
+
+    if out_path is not None:
+        features.flush()
+
+    return features
+
+
+def save_index(store_root, img_indices):
+    """save index.npy which maps img_idx to row number in features.npy."""
+    img_indices = np.asarray(img_indices, dtype=np.int64)
+    index = np.full(img_indices.max() + 1, -1, dtype=np.int64)
+    index[img_indices] = np.arange(len(img_indices))
+    np.save(str(Path(store_root) / INDEX_FILE), index)
+
+
+class FeatureStore:
+    """
+    memory mapped feature store created by build_feature_store.
+
+    Attributes
+    ----------
+    store_root : pathlib.Path
+        path to directory of feature store.
+
+    features : numpy.memmap
+        memory mapped features of shape (num_images, *feature_shape).
+
+    index : numpy.ndarray
+        row number in features for each img_idx.
+
+    dtype : numpy.dtype
+        dtype of returned features.
+
+    scale : numpy.ndarray
+        scale of each channel if features are quantized into int8.
+
+    zero_point : numpy.ndarray
+        zero point of each channel if features are quantized into int8.
+
+    memory_images : numpy.ndarray
+        img_idx of images read onto RAM by load_into_memory.
+        None if features are memory mapped or all images are read.
+    """
+
+    def __init__(self, store_root, mmap_mode='r', dtype=None):
+        """
+        Parameters
+        ----------
+        store_root : str
+            path to directory created by build_feature_store.
+
+        mmap_mode : str, default 'r'
+            mode to open features.npy. see numpy.load for detail.
+
+        dtype : numpy.dtype, default None
+            dtype of returned features.
+            int8 features are dequantized into this dtype(float32 if it is None),
+            and the other features are converted into this dtype if it is set.
+            e.g. numpy.float16 returns float16 features of float16 store without copy.
+        """
+        self.store_root = Path(store_root)
+        self.mmap_mode = mmap_mode
+        self.output_dtype = np.dtype(dtype) if dtype is not None else None
+        self.scale = None
+        self.zero_point = None
+        self.memory_images = None
+
+        for name in (FEATURE_FILE, INDEX_FILE):
+            if not (self.store_root / name).exists():
+                msg = 'File %s is not found.\n' % str(self.store_root / name)
+                raise FileNotFoundError(msg)
+
+        self.features = np.load(str(self.store_root / FEATURE_FILE), mmap_mode=mmap_mode)
+        self.index = np.load(str(self.store_root / INDEX_FILE))
+
+        if (self.store_root / QUANT_FILE).exists():
+            with np.load(str(self.store_root / QUANT_FILE)) as f:
+                self.scale = f['scale']
+                self.zero_point = f['zero_point']
+
+    def __len__(self):
+        return len(self.features)
+
+    def __getstate__(self):
+        # only the path is pickled so that worker processes reopen mmap
+        # instead of copying all features.
+        return {
+            'store_root': self.store_root,
+            'mmap_mode': self.mmap_mode,
+            'dtype': self.output_dtype,
+            'in_memory': not isinstance(self.features, np.memmap),
+            'memory_images': self.memory_images,
+        }
+
+    def __setstate__(self, state):
+        self.__init__(state['store_root'], mmap_mode=state['mmap_mode'], dtype=state['dtype'])
+        if state['in_memory']:
+            self.load_into_memory(state['memory_images'])
+
+    def __getitem__(self, img_idx):
+        """
+        return feature of img_idx as a view of memory mapped file.
+        if img_idx is an array, features are dequantized at once as a batch.
+        """
+        row = self.index[img_idx]
+        if np.any(row < 0):
+            msg = 'image %s is not contained in feature store %s\n' % (img_idx, self.store_root)
+            raise KeyError(msg)
+
+        return self.convert(self.features[row])
+
+    def convert(self, features):
+        """dequantize or convert features into self.output_dtype."""
+        if self.scale is not None:
+            return dequantize(
+                features, self.scale, self.zero_point, dtype=self.output_dtype or np.float32
+            )
+
+        if self.output_dtype is None:
+            return features
+        return features.astype(self.output_dtype, copy=False)
+
+    def load_into_memory(self, img_indices=None):
+        """
+        read features onto RAM in the stored dtype.
+        quantized features are still dequantized for each sample or batch,
+        so int8 store needs only a quarter of RAM of float32 features.
+
+        Parameters
+        ----------
+        img_indices : numpy.ndarray, default None
+            img_idx of images to be read, e.g. images of a rank in data-parallel training.
+            the other images are removed from index. all images are read if it is None.
+        """
+        if img_indices is None:
+            self.features = np.array(self.features)
+            return
+
+        img_indices = np.asarray(img_indices, dtype=np.int64)
+        rows = self.index[img_indices]
+        if np.any(rows < 0):
+            msg = 'some images are not contained in feature store %s\n' % self.store_root
+            raise KeyError(msg)
+
+        self.features = np.array(self.features[rows])
+        self.index = np.full(len(self.index), -1, dtype=self.index.dtype)
+        self.index[img_indices] = np.arange(len(img_indices))
+        self.memory_images = img_indices
+
+    def __contains__(self, img_idx):
+        return 0 <= img_idx < len(self.index) and self.index[img_idx] >= 0
+
+    @property
+    def shape(self):
+        """shape of each feature."""
+        return self.features.shape[1:]
+
+    @property
+    def dtype(self):
+        """dtype of returned features."""
+        if self.output_dtype is not None:
+            return self.output_dtype
+        if self.scale is not None:
+            return np.dtype(np.float32)
+        return self.features.dtype
+
+
+def build_feature_store(images, img_feature_root, store_root, workers=4):
+    """
+    convert per-image .npz features into a feature store.
+
+    Parameters
+    ----------
+    images : list
+        list of images which contain 'file_path' and 'img_idx'.
+        This is the same as IDGDatasetBase.images.
+
+    img_feature_root : str
+        path to directory of image features.
+
+    store_root : str
+        path to directory to save feature store.
+
+    workers : int, default 4
+        number of threads to read feature files.
+
+    Returns
+    -------
+    FeatureStore
+        feature store opened in read only mode.
+    """
+    store_root = Path(store_root)
+    store_root.mkdir(parents=True, exist_ok=True)
+
+    paths = [feature_path(img_feature_root, image['file_path']) for image in images]
+
+    features = read_features(paths, workers=workers, out_path=store_root / FEATURE_FILE)
+    del features
+
+    save_index(store_root, [image['img_idx'] for image in images])
+
+    return FeatureStore(store_root)
+
+
+if __name__ == '__main__':
+    from utils.columnar import load_cap2img, load_images
+    from utils.sharding import shard_indices
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('DATASET', type=str,
+                        help='path to dataset created by preprocess_tokens.py')
+    parser.add_argument('IMG_FEATURE_ROOT', type=str,
+                        help='path to directory of image features')
+    parser.add_argument('OUT', type=str,
+                        help='path to directory to save feature store')
+    parser.add_argument('--workers', type=int, default=4,
+                        help='number of threads to read feature files')
+    parser.add_argument('--rank', type=int, default=0,
+                        help='build feature store only for images owned by rank')
+    parser.add_argument('--world_size', type=int, default=1,
+                        help='number of ranks in data-parallel training')
+    args = parser.parse_args()
+
+    IMAGES = load_images(args.DATASET)
+    if args.world_size > 1:
+        IMG_INDICES, _ = shard_indices(
+            load_cap2img(args.DATASET), args.rank, args.world_size, num_images=len(IMAGES)
+        )
+        IMAGES = [IMAGES[img_idx] for img_idx in IMG_INDICES]
+    build_feature_store(IMAGES, args.IMG_FEATURE_ROOT, args.OUT, args.workers)
@@ -0,0 +1,101 @@
+"""
+Pre-resized uint8 image cache for raw_img mode.
+
+The image cache has the same layout as the feature store(see utils/feature_store.py),
+and features.npy contains uint8 images of shape (num_images, H, W, 3) in BGR order.
+JPEG decode and resize are done only once when the cache is built,
+and IDGDatasetBase only converts them into float32 and substracts mean.
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from tqdm import tqdm
+
+from utils.feature_store import FEATURE_FILE, FeatureStore, save_index
+from utils.process_image import ImgProcesser
+
+
+def build_image_cache(images, img_root, store_root, img_size=(224, 224), workers=4):
+    """
+    decode and resize all images into an image cache.
+
+    Parameters
+    ----------
+    images : list
+        list of images which contain 'file_path' and 'img_idx'.
+        This is the same as IDGDatasetBase.images.
+
+    img_root : str
+        path to directory of images.
+
+    store_root : str
+        path to directory to save image cache.
+
+    img_size : tuple, default (224, 224)
+        output image size after resizing images.
+
+    workers : int, default 4
+        number of threads to decode images.
+        OpenCV releases GIL while decoding and resizing images.
+
+    Returns
+    -------
+    FeatureStore
+        image cache opened in read only mode.
+    """
+    store_root = Path(store_root)
+    store_root.mkdir(parents=True, exist_ok=True)
+    img_proc = ImgProcesser()
+
+    width, height = img_size
+
+    cache = np.lib.format.open_memmap(
+        str(store_root / FEATURE_FILE),
+        mode='w+',
+        dtype=np.uint8,
+        shape=(len(images), height, width, 3)
+    )
+
+    def fill(row):
+        img_path = Path(img_root) / images[row]['file_path']
+        cache[row] = img_proc.read_img(str(img_path), img_size=img_size)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for _ in tqdm(executor.map(fill, range(len(images))), total=len(images)):
+            pass
+
+    cache.flush()
+    del cache
+
+    save_index(store_root, [image['img_idx'] for image in images])
+
+    return FeatureStore(store_root)
+
+
+if __name__ == '__main__':
+    from utils.columnar import load_images
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('DATASET', type=str,
+                        help='path to dataset created by preprocess_tokens.py')
+    parser.add_argument('IMG_ROOT', type=str,
+                        help='path to directory of images')
+    parser.add_argument('OUT', type=str,
+                        help='path to directory to save image cache')
+    parser.add_argument('--img_size', type=int, nargs=2, default=[224, 224],
+                        help='output image size(width height)')
+    parser.add_argument('--workers', type=int, default=4,
+                        help='number of threads to decode images')
+    args = parser.parse_args()
+
+    IMAGES = load_images(args.DATASET)
+    build_image_cache(
+        IMAGES,
+        args.IMG_ROOT,
+        args.OUT,
+        img_size=tuple(args.img_size),
+        workers=args.workers
+    )
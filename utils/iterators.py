@@ -0,0 +1,446 @@
+"""
+Chainer iterators to iterate IDGDatasetBase in the order decided by batch samplers.
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import chainer
+import numpy as np
+
+from utils.sampler import BucketBatchSampler, ImageGroupedBatchSampler
+
+
+class SamplerIterator(chainer.dataset.Iterator):
+    """
+    iterator which returns batches in the order decided by batch sampler.
+
+    This iterator returns list of examples like chainer.iterators.SerialIterator,
+    so it can be used with chainer.dataset.concat_examples and StandardUpdater.
+
+    Attributes
+    ----------
+    dataset : IDGDatasetBase
+        dataset to be iterated.
+
+    sampler : object
+        batch sampler which has get_batches() and __len__().
+
+    repeat : bool
+        repeat iteration over epochs or not.
+
+    epoch : int
+        number of completed epochs.
+
+    is_new_epoch : bool
+        True if the epoch is just completed.
+
+    current_position : int
+        position of the next batch in the current epoch.
+    """
+
+    def __init__(self, dataset, sampler, repeat=True):
+        """
+        Parameters
+        ----------
+        dataset : IDGDatasetBase
+            dataset to be iterated.
+
+        sampler : object
+            batch sampler which has get_batches() and __len__().
+
+        repeat : bool, default True
+            repeat iteration over epochs or not.
+        """
+        self.dataset = dataset
+        self.sampler = sampler
+        self.repeat = repeat
+        self.reset()
+
+    def __next__(self):
+        if not self.repeat and self.epoch > 0:
+            raise StopIteration
+
+        self._previous_epoch_detail = self.epoch_detail
+        batch = self._batches[self.current_position]
+        self._advance()
+
+        return self.fetch(batch)
+
+    next = __next__
+
+    def _advance(self):
+        """move current_position to the next batch and update epoch."""
+        self.current_position += 1
+
+        if self.current_position >= len(self._batches):
+            self.current_position = 0
+            self.epoch += 1
+            self.is_new_epoch = True
+            self._batches = self._next_epoch_batches()
+        else:
+            self.is_new_epoch = False
+
+    def _next_epoch_batches(self):
+        """return batches of the next epoch."""
+        return self.sampler.get_batches()
+
+    def fetch(self, batch):
+        """return list of examples of caption indices in batch."""
+        return [self.dataset[i] for i in batch]
+
+    @property
+    def epoch_detail(self):
+        return self.epoch + self.current_position / len(self._batches)
+
+    @property
+    def previous_epoch_detail(self):
+        if self._previous_epoch_detail < 0:
+            return None
+        return self._previous_epoch_detail
+
+    def reset(self):
+        """reset iterator to the beginning of the first epoch."""
+        self.current_position = 0
+        self.epoch = 0
+        self.is_new_epoch = False
+        self._previous_epoch_detail = -1.
+        self._batches = self.sampler.get_batches()
+
+    def serialize(self, serializer):
+        self.current_position = serializer('current_position', self.current_position)
+        self.epoch = serializer('epoch', self.epoch)
+        self.is_new_epoch = serializer('is_new_epoch', self.is_new_epoch)
+
+        # batches of the current epoch are saved as flattened indices and boundaries,
+        # because they are sampled again randomly by sampler if they are not restored.
+        loading = isinstance(serializer, chainer.serializer.Deserializer)
+        indices = None if loading else np.concatenate(self._batches).astype(np.int64)
+        offsets = None if loading else np.cumsum([0] + [len(b) for b in self._batches])
+        indices = serializer('batch_indices', indices)
+        offsets = serializer('batch_offsets', offsets)
+        self._previous_epoch_detail = serializer(
+            'previous_epoch_detail', self._previous_epoch_detail
+        )
+        if loading:
+            self._batches = [indices[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+
+class BucketIterator(SamplerIterator):
+    """
+    iterator which returns batches of captions with similar length.
+
+    Attributes
+    ----------
+    tokens : int
+        number of real tokens returned so far.
+
+    padded_tokens : int
+        number of tokens including padding returned so far.
+    """
+
+    def __init__(
+            self,
+            dataset,
+            batch_size,
+            bucket_boundaries=None,
+            repeat=True,
+            shuffle=True,
+            drop_last=False,
+            seed=None,
+    ):
+        """
+        Parameters
+        ----------
+        dataset : IDGDatasetBase
+            dataset to be iterated.
+
+        batch_size : int
+            number of captions in each batch.
+
+        bucket_boundaries : list of int, default None
+            upper bounds(exclusive) of caption length of each bucket.
+            if it is None, deciles of caption lengths are used.
+
+        repeat : bool, default True
+            repeat iteration over epochs or not.
+
+        shuffle : bool, default True
+            shuffle captions within buckets and batches across buckets.
+
+        drop_last : bool, default False
+            drop the last incomplete batch in each bucket.
+
+        seed : int, default None
+            seed of random number generator.
+        """
+        self.lengths = dataset.captions.lengths
+        self.tokens = 0
+        self.padded_tokens = 0
+
+        sampler = BucketBatchSampler(
+            self.lengths,
+            batch_size,
+            bucket_boundaries=bucket_boundaries,
+            shuffle=shuffle,
+            drop_last=drop_last,
+            seed=seed
+        )
+        super(BucketIterator, self).__init__(dataset, sampler, repeat=repeat)
+
+    def fetch(self, batch):
+        batch_lengths = self.lengths[batch]
+        self.tokens += int(batch_lengths.sum())
+        self.padded_tokens += len(batch) * int(batch_lengths.max())
+
+        return super(BucketIterator, self).fetch(batch)
+
+    @property
+    def padding_efficiency(self):
+        """ratio of real tokens to all tokens including padding returned so far."""
+        if not self.padded_tokens:
+            return 1.0
+        return self.tokens / self.padded_tokens
+
+    def observation(self, prefix='bucket/'):
+        """
+        return padding statistics as a dict.
+        it can be passed to chainer.reporter.report.
+        """
+        return {
+            prefix + 'padding_efficiency': self.padding_efficiency,
+            prefix + 'tokens': self.tokens,
+            prefix + 'padded_tokens': self.padded_tokens,
+        }
+
+
+class ImageGroupedIterator(SamplerIterator):
+    """
+    iterator which returns batches grouped by images.
+
+    Each batch is a tuple returned by IDGDatasetBase.get_grouped_examples,
+    so each image feature is loaded only once in a batch.
+    Use a converter which handles the tuple instead of concat_examples.
+    """
+
+    def __init__(
+            self,
+            dataset,
+            batch_size,
+            captions_per_image=None,
+            repeat=True,
+            shuffle=True,
+            drop_last=False,
+            seed=None,
+            padding=-1,
+    ):
+        """
+        Parameters
+        ----------
+        dataset : IDGDatasetBase
+            dataset to be iterated.
+
+        batch_size : int
+            number of images in each batch.
+
+        captions_per_image : int, default None
+            number of captions sampled for each image.
+            if it is None, all captions of each image are used,
+            so every caption appears once in each epoch.
+
+        repeat : bool, default True
+            repeat iteration over epochs or not.
+
+        shuffle : bool, default True
+            shuffle images for each epoch.
+
+        drop_last : bool, default False
+            drop the last incomplete batch.
+
+        seed : int, default None
+            seed of random number generator.
+
+        padding : int, default -1
+            value to fill the positions after the end of each caption.
+        """
+        self.padding = padding
+        sampler = ImageGroupedBatchSampler(
+            dataset.cap2img,
+            batch_size,
+            captions_per_image=captions_per_image,
+            shuffle=shuffle,
+            drop_last=drop_last,
+            seed=seed
+        )
+        super(ImageGroupedIterator, self).__init__(dataset, sampler, repeat=repeat)
+
+    def fetch(self, batch):
+        return self.dataset.get_grouped_examples(batch, padding=self.padding)
+
+
+class PrefetchIterator(SamplerIterator):
+    """
+    iterator which reads the upcoming batches on background threads.
+
+    The order of batches is decided beforehand by batch sampler,
+    so reads of the next n_prefetch batches are issued while the current batch is used.
+
+    Attributes
+    ----------
+    n_prefetch : int
+        number of batches read ahead.
+
+    batched : bool
+        return dataset.get_examples(batch) instead of list of examples.
+
+    stall_time : float
+        total seconds spent waiting for batches not read yet.
+
+    stalls : int
+        number of batches which were not ready when they were requested.
+
+    batches : int
+        number of batches returned so far.
+
+    queue_depth : int
+        number of ready batches in queue when the last batch was requested.
+    """
+
+    def __init__(
+            self,
+            dataset,
+            sampler,
+            n_prefetch=2,
+            n_threads=2,
+            repeat=True,
+            batched=False,
+    ):
+        """
+        Parameters
+        ----------
+        dataset : IDGDatasetBase
+            dataset to be iterated.
+
+        sampler : object
+            batch sampler which has get_batches() and __len__().
+
+        n_prefetch : int, default 2
+            number of batches read ahead.
+
+        n_threads : int, default 2
+            number of threads to read batches.
+
+        repeat : bool, default True
+            repeat iteration over epochs or not.
+
+        batched : bool, default False
+            return dataset.get_examples(batch) instead of list of examples.
+        """
+        self.n_prefetch = n_prefetch
+        self.batched = batched
+        self._executor = ThreadPoolExecutor(max_workers=n_threads)
+        self._queue = deque()
+        self._lock = threading.Lock()
+        super(PrefetchIterator, self).__init__(dataset, sampler, repeat=repeat)
+
+    def __next__(self):
+        if not self.repeat and self.epoch > 0:
+            raise StopIteration
+
+        self._previous_epoch_detail = self.epoch_detail
+        self._fill()
+        future = self._queue.popleft()
+        self._advance()
+        self._fill()
+
+        self.queue_depth = sum(f.done() for f in self._queue) + future.done()
+        if not future.done():
+            start = time.perf_counter()
+            batch = future.result()
+            self.stall_time += time.perf_counter() - start
+            self.stalls += 1
+        else:
+            batch = future.result()
+        self.batches += 1
+
+        return batch
+
+    next = __next__
+
+    def fetch(self, batch):
+        if self.batched:
+            return self.dataset.get_examples(batch)
+        return super(PrefetchIterator, self).fetch(batch)
+
+    def _plan_batches(self, epoch, batches):
+        """generate batches in the order they will be returned from batches of epoch."""
+        while True:
+            for batch in batches:
+                yield batch
+            if not self.repeat:
+                return
+            epoch += 1
+            batches = self._epoch_batches(epoch)
+
+    def _epoch_batches(self, epoch):
+        """
+        return batches of epoch, drawing them from sampler if they are not drawn yet.
+
+        Each epoch is drawn exactly once and shared by _plan_batches, which runs
+        ahead of the iterator, and _advance, so both see the same order.
+        """
+        while epoch not in self._planned_epochs:
+            self._planned_epochs[max(self._planned_epochs) + 1] = self.sampler.get_batches()
+        return self._planned_epochs[epoch]
+
+    def _next_epoch_batches(self):
+        batches = self._epoch_batches(self.epoch)
+        for epoch in [e for e in self._planned_epochs if e < self.epoch]:
+            del self._planned_epochs[epoch]
+        return batches
+
+    def _fill(self):
+        """issue reads until n_prefetch batches are queued."""
+        with self._lock:
+            while len(self._queue) < max(self.n_prefetch, 1):
+                batch = next(self._plan, None)
+                if batch is None:
+                    break
+                self._queue.append(self._executor.submit(self.fetch, batch))
+
+    def reset(self):
+        super(PrefetchIterator, self).reset()
+        self._restart()
+        self.stall_time = 0.
+        self.stalls = 0
+        self.batches = 0
+        self.queue_depth = 0
+
+    def _restart(self):
+        """drop queued batches and plan again from current_position."""
+        for future in self._queue:
+            future.cancel()
+        self._queue.clear()
+        self._planned_epochs = {self.epoch: self._batches}
+        self._plan = self._plan_batches(self.epoch, self._batches[self.current_position:])
+
+    def serialize(self, serializer):
+        super(PrefetchIterator, self).serialize(serializer)
+        if isinstance(serializer, chainer.serializer.Deserializer):
+            self._restart()
+
+    def finalize(self):
+        """stop background threads."""
+        self._restart()
+        self._executor.shutdown(wait=True)
+
+    def stats(self):
+        """return prefetch statistics as a dict."""
+        return {
+            'batches': self.batches,
+            'stalls': self.stalls,
+            'stall_time': self.stall_time,
+            'queue_depth': self.queue_depth,
+        }
@@ -0,0 +1,159 @@
+"""
+Opt-in timers and counters for each stage of loading images, features and captions.
+"""
+
+import threading
+import time
+from collections import defaultdict
+
+
+class _Stage:
+    """context manager which adds elapsed time to a stage of profiler."""
+
+    __slots__ = ['profiler', 'name', 'start']
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.profiler.add_time(self.name, time.perf_counter() - self.start)
+
+
+class _NullStage:
+    """context manager which does nothing."""
+
+    __slots__ = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class StageProfiler:
+    """
+    per-stage timers and counters.
+
+    Attributes
+    ----------
+    times : dict
+        total seconds spent in each stage.
+
+    calls : dict
+        number of calls of each stage.
+
+    counts : dict
+        value of each counter like bytes read, samples and cache hits.
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def stage(self, name):
+        """
+        return context manager to measure time spent in stage name.
+
+        Examples
+        --------
+        >>> with profiler.stage('jpeg_decode'):
+        ...     img = cv2.imread(path)
+        """
+        return _Stage(self, name)
+
+    def add_time(self, name, seconds):
+        """add seconds spent in stage name."""
+        with self._lock:
+            self.times[name] += seconds
+            self.calls[name] += 1
+
+    def count(self, name, value=1):
+        """add value to counter name."""
+        with self._lock:
+            self.counts[name] += value
+
+    def reset(self):
+        """reset all timers and counters."""
+        with self._lock:
+            self.times = defaultdict(float)
+            self.calls = defaultdict(int)
+            self.counts = defaultdict(int)
+
+    def snapshot(self, prefix=''):
+        """
+        return timers and counters as a flat dict.
+
+        Returns
+        -------
+        dict
+            '<prefix>time/<stage>' is total seconds, '<prefix>calls/<stage>' is
+            number of calls and '<prefix><counter>' is value of each counter.
+        """
+        with self._lock:
+            res = {}
+            for name, seconds in self.times.items():
+                res['{0}time/{1}'.format(prefix, name)] = seconds
+                res['{0}calls/{1}'.format(prefix, name)] = self.calls[name]
+            for name, value in self.counts.items():
+                res['{0}{1}'.format(prefix, name)] = value
+        return res
+
+    def report(self, prefix='loader/', observer=None, reset=True):
+        """
+        report snapshot to the current chainer.reporter.Reporter.
+        call this in a training extension or updater to show the numbers
+        in LogReport next to iterations/sec.
+
+        Parameters
+        ----------
+        prefix : str, default 'loader/'
+            prefix of each key.
+
+        observer : object, default None
+            observer passed to chainer.reporter.report.
+
+        reset : bool, default True
+            reset timers and counters after reporting.
+        """
+        import chainer
+
+        chainer.reporter.report(self.snapshot(prefix), observer)
+        if reset:
+            self.reset()
+
+    def __getstate__(self):
+        # each process has its own timers and counters.
+        return {}
+
+    def __setstate__(self, state):
+        self.__init__()
+
+
+class NullProfiler(StageProfiler):
+    """profiler which measures nothing. used when profiling is disabled."""
+
+    enabled = False
+
+    def stage(self, name):
+        return _NULL_STAGE
+
+    def add_time(self, name, seconds):
+        pass
+
+    def count(self, name, value=1):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
@@ -0,0 +1,187 @@
+"""
+Reduced-precision storage of image features.
+
+This module converts a float32 feature store(see utils/feature_store.py)
+into float16 or per-channel int8 feature store.
+int8 features are dequantized by (q - zero_point) * scale,
+and scale and zero_point of each channel are saved in quantization.npz.
+The error of the conversion is measured over all features and saved
+as quantization_report.json.
+"""
+
+import argparse
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+from tqdm import tqdm
+
+from utils.feature_store import FEATURE_FILE, INDEX_FILE, QUANT_FILE, FeatureStore, dequantize
+
+
+REPORT_FILE = 'quantization_report.json'
+MODES = ('float16', 'int8')
+
+
+def channel_range(features, chunk_size=1024):
+    """
+    return min and max of each channel over all features.
+    channel is the first axis of each feature.
+    """
+    reduce_axes = (0,) + tuple(range(2, features.ndim))
+    mins = None
+    maxs = None
+
+    for start in range(0, len(features), chunk_size):
+        chunk = np.asarray(features[start:start + chunk_size], dtype=np.float32)
+        chunk_min = chunk.min(axis=reduce_axes, keepdims=True)[0]
+        chunk_max = chunk.max(axis=reduce_axes, keepdims=True)[0]
+        mins = chunk_min if mins is None else np.minimum(mins, chunk_min)
+        maxs = chunk_max if maxs is None else np.maximum(maxs, chunk_max)
+
+    return mins, maxs
+
+
+def int8_params(mins, maxs):
+    """return scale and zero_point which map [mins, maxs] onto [-128, 127]."""
+    scale = (maxs - mins) / 255.
+    scale[scale == 0] = 1.
+    zero_point = np.round(-128. - mins / scale)
+
+    return scale.astype(np.float32), zero_point.astype(np.float32)
+
+
+def quantize_int8(features, scale, zero_point):
+    """quantize float features into int8 with scale and zero_point."""
+    q = np.round(features / scale + zero_point)
+    return np.clip(q, -128, 127).astype(np.int8)
+
+
+class ErrorMeter:
+    """accumulate errors between original and dequantized features."""
+
+    def __init__(self):
+        self.count = 0
+        self.num_features = 0
+        self.abs_error = 0.
+        self.max_abs_error = 0.
+        self.sq_error = 0.
+        self.sq_value = 0.
+        self.cosine = []
+
+    def update(self, original, restored):
+        original = original.reshape(len(original), -1).astype(np.float64)
+        restored = restored.reshape(len(restored), -1).astype(np.float64)
+        diff = restored - original
+
+        self.count += diff.size
+        self.num_features += len(original)
+        self.abs_error += np.abs(diff).sum()
+        self.max_abs_error = max(self.max_abs_error, float(np.abs(diff).max()))
+        self.sq_error += np.square(diff).sum()
+        self.sq_value += np.square(original).sum()
+
+        norms = np.linalg.norm(original, axis=1) * np.linalg.norm(restored, axis=1)
+        norms[norms == 0] = 1.
+        self.cosine.append((original * restored).sum(axis=1) / norms)
+
+    def report(self):
+        cosine = np.concatenate(self.cosine)
+        return {
+            'num_features': self.num_features,
+            'mean_abs_error': float(self.abs_error / self.count),
+            'max_abs_error': self.max_abs_error,
+            'rmse': float(np.sqrt(self.sq_error / self.count)),
+            'relative_rmse': float(np.sqrt(self.sq_error / self.sq_value)) if self.sq_value else 0.,
+            'mean_cosine_similarity': float(cosine.mean()),
+            'min_cosine_similarity': float(cosine.min()),
+        }
+
+
+def quantize_feature_store(store_root, out_root, mode='int8', chunk_size=1024):
+    """
+    convert float32 feature store into float16 or int8 feature store.
+
+    Parameters
+    ----------
+    store_root : str
+        path to feature store created by utils/feature_store.py.
+
+    out_root : str
+        path to directory to save converted feature store.
+
+    mode : str, default 'int8'
+        'float16' or 'int8'. int8 uses per-channel scale and zero point.
+
+    chunk_size : int, default 1024
+        number of features converted at once.
+
+    Returns
+    -------
+    report : dict
+        bytes of original and converted features and errors of dequantized features.
+    """
+    if mode not in MODES:
+        msg = 'mode has to be one of %s\n' % str(MODES)
+        raise ValueError(msg)
+
+    store = FeatureStore(store_root)
+    features = store.features
+    out_root = Path(out_root)
+    out_root.mkdir(parents=True, exist_ok=True)
+
+    out = np.lib.format.open_memmap(
+        str(out_root / FEATURE_FILE),
+        mode='w+',
+        dtype=np.float16 if mode == 'float16' else np.int8,
+        shape=features.shape
+    )
+
+    if mode == 'int8':
+        scale, zero_point = int8_params(*channel_range(features, chunk_size))
+        np.savez(str(out_root / QUANT_FILE), scale=scale, zero_point=zero_point)
+
+    meter = ErrorMeter()
+    for start in tqdm(range(0, len(features), chunk_size)):
+        chunk = np.asarray(features[start:start + chunk_size], dtype=np.float32)
+        if mode == 'int8':
+            q = quantize_int8(chunk, scale, zero_point)
+            restored = dequantize(q, scale, zero_point)
+        else:
+            q = chunk.astype(np.float16)
+            restored = q.astype(np.float32)
+
+        out[start:start + chunk_size] = q
+        meter.update(chunk, restored)
+
+    out.flush()
+    del out
+    shutil.copy(str(Path(store_root) / INDEX_FILE), str(out_root / INDEX_FILE))
+
+    report = {
+        'mode': mode,
+        'original_bytes': int(features.nbytes),
+        'quantized_bytes': int(features.size * (2 if mode == 'float16' else 1)),
+    }
+    report.update(meter.report())
+    with (out_root / REPORT_FILE).open('w') as f:
+        json.dump(report, f, indent=2)
+
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('STORE', type=str,
+                        help='path to float32 feature store')
+    parser.add_argument('OUT', type=str,
+                        help='path to directory to save converted feature store')
+    parser.add_argument('--mode', type=str, choices=MODES, default='int8',
+                        help='storage format of converted features')
+    parser.add_argument('--chunk_size', type=int, default=1024,
+                        help='number of features converted at once')
+    args = parser.parse_args()
+
+    REPORT = quantize_feature_store(args.STORE, args.OUT, args.mode, args.chunk_size)
+    print(json.dumps(REPORT, indent=2))
@@ -0,0 +1,258 @@
+"""
+Batch samplers which decide the order of caption indices for each epoch.
+"""
+
+import numpy as np
+
+
+def padding_efficiency(lengths, batches):
+    """
+    ratio of real tokens to all tokens including padding.
+
+    Parameters
+    ----------
+    lengths : numpy.ndarray
+        length of each caption.
+
+    batches : list
+        list of arrays of caption indices.
+
+    Returns
+    -------
+    float
+        1.0 means no padding is required.
+    """
+    tokens = 0
+    padded_tokens = 0
+    for batch in batches:
+        batch_lengths = lengths[batch]
+        tokens += batch_lengths.sum()
+        padded_tokens += len(batch) * batch_lengths.max()
+
+    return float(tokens / padded_tokens) if padded_tokens else 1.0
+
+
+class BucketBatchSampler:
+    """
+    group caption indices with similar length into the same batch.
+
+    Attributes
+    ----------
+    lengths : numpy.ndarray
+        length of each caption.
+
+    batch_size : int
+        number of captions in each batch.
+
+    bucket_boundaries : numpy.ndarray
+        upper bounds(exclusive) of caption length of each bucket.
+
+    bucket_ids : numpy.ndarray
+        bucket id of each caption.
+
+    shuffle : bool
+        shuffle captions within buckets and batches across buckets.
+
+    drop_last : bool
+        drop the last incomplete batch in each bucket.
+    """
+
+    def __init__(
+            self,
+            lengths,
+            batch_size,
+            bucket_boundaries=None,
+            shuffle=True,
+            drop_last=False,
+            seed=None,
+    ):
+        """
+        Parameters
+        ----------
+        lengths : array-like
+            length of each caption. IDGDatasetBase.captions.lengths can be used.
+
+        batch_size : int
+            number of captions in each batch.
+
+        bucket_boundaries : list of int, default None
+            upper bounds(exclusive) of caption length of each bucket.
+            if it is None, deciles of lengths are used.
+
+        shuffle : bool, default True
+            shuffle captions within buckets and batches across buckets.
+
+        drop_last : bool, default False
+            drop the last incomplete batch in each bucket.
+
+        seed : int, default None
+            seed of random number generator.
+        """
+        self.lengths = np.asarray(lengths)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.rng = np.random.RandomState(seed)
+
+        if bucket_boundaries is None:
+            bucket_boundaries = np.percentile(self.lengths, np.arange(10, 100, 10))
+        self.bucket_boundaries = np.unique(np.asarray(bucket_boundaries, dtype=np.int64))
+        self.bucket_ids = np.searchsorted(self.bucket_boundaries, self.lengths, side='right')
+
+    def __len__(self):
+        counts = np.bincount(self.bucket_ids)
+        if self.drop_last:
+            return int((counts // self.batch_size).sum())
+        return int(((counts + self.batch_size - 1) // self.batch_size).sum())
+
+    def get_batches(self):
+        """
+        return batches of caption indices for one epoch.
+
+        Returns
+        -------
+        batches : list
+            list of numpy.ndarray of caption indices.
+        """
+        order = np.argsort(self.bucket_ids, kind='mergesort')
+        bucket_ids = self.bucket_ids[order]
+        splits = np.flatnonzero(np.diff(bucket_ids)) + 1
+
+        batches = []
+        for bucket in np.split(order, splits):
+            if self.shuffle:
+                self.rng.shuffle(bucket)
+
+            for start in range(0, len(bucket), self.batch_size):
+                batch = bucket[start:start + self.batch_size]
+                if self.drop_last and len(batch) < self.batch_size:
+                    continue
+                batches.append(batch)
+
+        if self.shuffle:
+            batches = [batches[i] for i in self.rng.permutation(len(batches))]
+
+        return batches
+
+    def padding_efficiency(self, batches=None):
+        """
+        padding efficiency of batches.
+        if batches is None, batches of one epoch are sampled.
+        """
+        if batches is None:
+            batches = self.get_batches()
+        return padding_efficiency(self.lengths, batches)
+
+
+class ImageGroupedBatchSampler:
+    """
+    sample images and then their captions, so each image appears once in a batch.
+
+    Attributes
+    ----------
+    cap2img : numpy.ndarray
+        img_idx of each caption.
+
+    batch_size : int
+        number of images in each batch.
+
+    captions_per_image : int or None
+        number of captions sampled for each image.
+        if it is None, all captions of each image are used,
+        so every caption appears once in each epoch.
+
+    shuffle : bool
+        shuffle images for each epoch.
+
+    drop_last : bool
+        drop the last incomplete batch.
+    """
+
+    def __init__(
+            self,
+            cap2img,
+            batch_size,
+            captions_per_image=None,
+            shuffle=True,
+            drop_last=False,
+            seed=None,
+    ):
+        """
+        Parameters
+        ----------
+        cap2img : array-like
+            img_idx of each caption. IDGDatasetBase.cap2img can be used.
+
+        batch_size : int
+            number of images in each batch.
+
+        captions_per_image : int, default None
+            number of captions sampled for each image.
+            if it is None, all captions of each image are used.
+
+        shuffle : bool, default True
+            shuffle images for each epoch.
+
+        drop_last : bool, default False
+            drop the last incomplete batch.
+
+        seed : int, default None
+            seed of random number generator.
+        """
+        self.cap2img = np.asarray(cap2img)
+        self.batch_size = batch_size
+        self.captions_per_image = captions_per_image
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.rng = np.random.RandomState(seed)
+
+        # captions sorted by img_idx and the range of captions of each image.
+        self.order = np.argsort(self.cap2img, kind='mergesort')
+        _, self.starts, self.counts = np.unique(
+            self.cap2img[self.order], return_index=True, return_counts=True
+        )
+
+    def __len__(self):
+        if self.drop_last:
+            return len(self.starts) // self.batch_size
+        return (len(self.starts) + self.batch_size - 1) // self.batch_size
+
+    def _captions_of(self, images):
+        """return caption indices sampled from images."""
+        if self.captions_per_image is None:
+            return np.concatenate(
+                [self.order[self.starts[i]:self.starts[i] + self.counts[i]] for i in images]
+            )
+
+        if self.captions_per_image == 1:
+            picks = (self.rng.rand(len(images)) * self.counts[images]).astype(np.int64)
+            return self.order[self.starts[images] + picks]
+
+        return np.concatenate([
+            self.order[self.starts[i] + self.rng.permutation(self.counts[i])[:self.captions_per_image]]
+            for i in images
+        ])
+
+    def get_batches(self):
+        """
+        return batches of caption indices for one epoch.
+
+        Returns
+        -------
+        batches : list
+            list of numpy.ndarray of caption indices.
+            captions of the same image are next to each other.
+        """
+        if self.shuffle:
+            images = self.rng.permutation(len(self.starts))
+        else:
+            images = np.arange(len(self.starts))
+
+        batches = []
+        for start in range(0, len(images), self.batch_size):
+            batch_images = images[start:start + self.batch_size]
+            if self.drop_last and len(batch_images) < self.batch_size:
+                continue
+            batches.append(self._captions_of(batch_images))
+
+        return batches
@@ -0,0 +1,89 @@
+"""
+Image-aware sharding of captions for multi-node data-parallel training.
+
+All captions of an image are assigned to the same rank,
+so each rank reads and preloads only features of its own images.
+Caption counts of ranks can differ by up to the number of captions of an image,
+so shards can be padded to the same length like force_equal_length of
+chainermn.scatter_dataset, otherwise ranks run different numbers of iterations
+and the allreduce of the last iterations hangs.
+"""
+
+import heapq
+
+import numpy as np
+
+
+def partition_images(cap2img, world_size, num_images=None):
+    """
+    assign each image to a rank so that caption counts are balanced.
+
+    Images are assigned greedily in descending order of caption counts
+    to the rank which has the fewest captions.
+    The result is deterministic, so every rank computes the same partition.
+
+    Parameters
+    ----------
+    cap2img : numpy.ndarray
+        img_idx of each caption.
+
+    world_size : int
+        number of ranks.
+
+    num_images : int, default None
+        number of images. images without captions are also assigned.
+
+    Returns
+    -------
+    owner : numpy.ndarray
+        int32 rank of each img_idx.
+    """
+    counts = np.bincount(cap2img, minlength=num_images or 0)
+    owner = np.empty(len(counts), dtype=np.int32)
+
+    loads = [(0, rank) for rank in range(world_size)]
+    for img_idx in np.argsort(-counts, kind='mergesort'):
+        load, rank = heapq.heappop(loads)
+        owner[img_idx] = rank
+        heapq.heappush(loads, (load + int(counts[img_idx]), rank))
+
+    return owner
+
+
+def shard_indices(cap2img, rank, world_size, num_images=None, force_equal_length=False):
+    """
+    return images and captions assigned to rank.
+
+    Parameters
+    ----------
+    force_equal_length : bool, default False
+        pad caption indices of every rank to the length of the largest shard
+        by repeating its own captions from the beginning.
+        padded captions are seen twice in an epoch, but no rank reads images of other ranks.
+
+    Returns
+    -------
+    img_indices : numpy.ndarray
+        sorted img_idx owned by rank.
+
+    caption_indices : numpy.ndarray
+        sorted caption indices whose image is owned by rank,
+        followed by repeated ones if force_equal_length is True.
+    """
+    if not 0 <= rank < world_size:
+        msg = 'rank %d is out of range of world_size %d\n' % (rank, world_size)
+        raise ValueError(msg)
+
+    owner = partition_images(cap2img, world_size, num_images=num_images)
+    img_indices = np.flatnonzero(owner == rank)
+    caption_ranks = owner[cap2img]
+    caption_indices = np.flatnonzero(caption_ranks == rank)
+
+    if force_equal_length:
+        counts = np.bincount(caption_ranks, minlength=world_size)
+        if counts.min() == 0:
+            msg = 'some ranks have no captions with world_size %d\n' % world_size
+            raise ValueError(msg)
+        caption_indices = np.resize(caption_indices, counts.max())
+
+    return img_indices, caption_indices
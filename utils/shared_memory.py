@@ -0,0 +1,89 @@
+"""
+File backed numpy array shared between processes.
+
+The array is saved as .npy file (on /dev/shm by default) and each process opens it with mmap.
+Pickling SharedArray only sends the path to the file,
+so worker processes of chainer.iterators.MultiprocessIterator don't copy the array.
+"""
+
+import os
+import tempfile
+import weakref
+from pathlib import Path
+
+import numpy as np
+
+
+DEFAULT_SHM_DIR = '/dev/shm'
+
+
+def _unlink(path, pid):
+    """remove shared file only from the process which created it."""
+    if os.getpid() == pid and os.path.exists(path):
+        os.remove(path)
+
+
+def create_shared_path(shm_dir=DEFAULT_SHM_DIR, prefix='idg_features_'):
+    """
+    return path to a new empty .npy file in shm_dir.
+    if shm_dir doesn't exist, default temporary directory is used instead.
+    """
+    if not Path(shm_dir).is_dir():
+        shm_dir = None
+
+    fd, path = tempfile.mkstemp(suffix='.npy', prefix=prefix, dir=shm_dir)
+    os.close(fd)
+
+    return path
+
+
+class SharedArray:
+    """
+    handle of .npy file opened with mmap in each process.
+
+    Attributes
+    ----------
+    path : str
+        path to .npy file.
+
+    owner : bool
+        whether or not this handle removes the file when it is closed.
+        handles restored by pickle are never owners.
+    """
+
+    def __init__(self, path, owner=False):
+        """
+        Parameters
+        ----------
+        path : str
+            path to .npy file.
+
+        owner : bool, default False
+            remove the file when this handle is closed or garbage collected.
+        """
+        self.path = str(path)
+        self.owner = owner
+        self._array = None
+        self._finalizer = None
+
+        if owner:
+            self._finalizer = weakref.finalize(self, _unlink, self.path, os.getpid())
+
+    @property
+    def array(self):
+        """numpy.memmap opened in read only mode."""
+        if self._array is None:
+            self._array = np.load(self.path, mmap_mode='r')
+        return self._array
+
+    def close(self):
+        """release mmap and remove the file if this handle is owner."""
+        self._array = None
+        if self._finalizer is not None:
+            self._finalizer()
+
+    def __getstate__(self):
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'], owner=False)
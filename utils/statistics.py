@@ -0,0 +1,173 @@
+"""
+Vectorized statistics of caption corpus.
+
+Statistics are computed over packed captions with numpy at once,
+and saved as JSON next to the dataset, so they are not computed again
+until the dataset file is changed.
+"""
+
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+
+STATS_VERSION = 1
+
+
+def unk_ratio(tokens, unk_id):
+    """ratio of <UNK> in tokens."""
+    if tokens.size == 0:
+        return 0.0
+    return float(np.count_nonzero(tokens == unk_id) / tokens.size)
+
+
+def compute_statistics(captions, num_images, vocab_size, unk_id=0, img_indices=None):
+    """
+    compute statistics of captions.
+
+    Parameters
+    ----------
+    captions : PackedCaptions
+        captions to be analyzed.
+
+    num_images : int
+        number of images.
+
+    vocab_size : int
+        vocabulary size.
+
+    unk_id : int, default 0
+        word id of <UNK>.
+
+    img_indices : numpy.ndarray, default None
+        img_idx of images counted in captions_per_image_histogram.
+        all images are counted if it is None.
+
+    Returns
+    -------
+    stats : dict
+        'num_captions', 'num_images', 'num_tokens', 'vocabulary_size',
+        'unk_ratio', 'length_mean', 'length_min', 'length_max',
+        'length_histogram'(number of captions of each length),
+        'token_frequencies'(frequency of each word id),
+        'vocabulary_coverage'(ratio of words in vocabulary which appear in captions),
+        'captions_per_image_histogram'(number of images of each caption count).
+    """
+    tokens = np.asarray(captions.tokens)
+    lengths = captions.lengths
+    frequencies = np.bincount(tokens, minlength=vocab_size)
+    captions_per_image = np.bincount(captions.cap2img, minlength=num_images)
+    if img_indices is not None:
+        captions_per_image = captions_per_image[img_indices]
+        num_images = len(img_indices)
+
+    return {
+        'num_captions': len(captions),
+        'num_images': int(num_images),
+        'num_tokens': int(tokens.size),
+        'vocabulary_size': int(vocab_size),
+        'unk_ratio': unk_ratio(tokens, unk_id),
+        'length_mean': float(lengths.mean()) if len(lengths) else 0.0,
+        'length_min': int(lengths.min()) if len(lengths) else 0,
+        'length_max': int(lengths.max()) if len(lengths) else 0,
+        'length_histogram': np.bincount(lengths).tolist(),
+        'token_frequencies': frequencies.tolist(),
+        'vocabulary_coverage': float(np.count_nonzero(frequencies) / vocab_size) if vocab_size else 0.0,
+        'captions_per_image_histogram': np.bincount(captions_per_image).tolist(),
+    }
+
+
+def stats_path(dataset_path, rank=0, world_size=1):
+    """return path to JSON file to save statistics of dataset_path."""
+    dataset_path = Path(dataset_path)
+    name = 'stats.json' if world_size == 1 else 'stats.rank{0}of{1}.json'.format(rank, world_size)
+
+    if dataset_path.is_dir():
+        return dataset_path / name
+    return dataset_path.with_suffix('.' + name)
+
+
+def source_signature(*paths):
+    """return size and modification time of paths to detect changes of dataset."""
+    signature = []
+    for path in paths:
+        if not path:
+            continue
+        path = Path(path)
+        if path.is_dir():
+            files = sorted(p for p in path.iterdir() if p.suffix == '.npy')
+        else:
+            files = [path]
+        for f in files:
+            stat = os.stat(str(f))
+            signature.append([f.name, stat.st_size, int(stat.st_mtime)])
+
+    return signature
+
+
+class CorpusStatistics:
+    """
+    memoized statistics of caption corpus saved next to the dataset.
+
+    Attributes
+    ----------
+    path : pathlib.Path
+        path to JSON file to save statistics. None disables saving.
+
+    signature : list
+        size and modification time of files used to compute statistics.
+    """
+
+    def __init__(self, path=None, signature=None):
+        """
+        Parameters
+        ----------
+        path : str, default None
+            path to JSON file to save statistics.
+
+        signature : list, default None
+            size and modification time of dataset returned by source_signature.
+        """
+        self.path = Path(path) if path else None
+        self.signature = signature
+        self._stats = None
+
+    def load(self):
+        """return saved statistics if they are computed from the same dataset."""
+        if self.path is None or not self.path.exists():
+            return None
+
+        with self.path.open('r') as f:
+            saved = json.load(f)
+
+        if saved.get('version') != STATS_VERSION or saved.get('signature') != self.signature:
+            return None
+        return saved['stats']
+
+    def save(self, stats):
+        """save statistics as JSON. it is skipped if the directory is not writable."""
+        if self.path is None:
+            return
+
+        saved = {'version': STATS_VERSION, 'signature': self.signature, 'stats': stats}
+        try:
+            with self.path.open('w') as f:
+                json.dump(saved, f)
+        except OSError:
+            pass
+
+    def get(self, compute):
+        """
+        return memoized statistics.
+        compute() is called only if statistics are neither in memory nor saved.
+        """
+        if self._stats is None:
+            self._stats = self.load()
+
+        if self._stats is None:
+            self._stats = compute()
+            self.save(self._stats)
+
+        return self._stats